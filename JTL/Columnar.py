@@ -0,0 +1,352 @@
+# -*- coding:utf-8 -*-
+
+# Copyright (c) 2015-2021 Agalmic Ventures LLC (www.agalmicventures.com)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+"""
+Evaluates a template over a batch of records stored as columns: each operation runs once per column instead of once
+per record.
+
+A batch is a dict from period separated paths to lists of the same length, e.g.
+{'weather.temp': [...], 'city': [...]}. A column can hold dicts indexed further by longer selectors, and the column
+'*' holds whole records.
+"""
+
+from JTL import Functions
+from JTL import Interpreter
+from JTL import Optimizer
+from JTL import Parser
+from JTL import Utility
+
+# Column holding the whole records
+RECORDS = '*'
+
+
+def _maybeConstant(operator):
+    """
+    Builds a whole-column kernel for a maybe binary operator with a constant right operand.
+
+    :param operator: f(column, constant) -> column with the operation applied to the non null values
+    :return: f(column, constant), or None when the column holds lists (applied element-wise by Functions)
+    """
+    def kernel(column, constant):
+        if constant is None:
+            return [None] * len(column)
+        if list in set(map(type, column)):
+            return None
+        return operator(column, constant)
+    return kernel
+
+
+# Kernels of the arithmetic and comparison operators with a constant operand, written out to avoid a call per value
+constantKernels = {
+    '+': _maybeConstant(lambda c, y: [None if x is None else x + y for x in c]),
+    '-': _maybeConstant(lambda c, y: [None if x is None else x - y for x in c]),
+    '*': _maybeConstant(lambda c, y: [None if x is None else x * y for x in c]),
+    '/': _maybeConstant(lambda c, y: [None if x is None else x / y for x in c]),
+    '**': _maybeConstant(lambda c, y: [None if x is None else x ** y for x in c]),
+    '%': _maybeConstant(lambda c, y: [None if x is None else x % y for x in c]),
+    '==': _maybeConstant(lambda c, y: [None if x is None else x == y for x in c]),
+    '!=': _maybeConstant(lambda c, y: [None if x is None else x != y for x in c]),
+    '<': _maybeConstant(lambda c, y: [None if x is None else x < y for x in c]),
+    '<=': _maybeConstant(lambda c, y: [None if x is None else x <= y for x in c]),
+    '>': _maybeConstant(lambda c, y: [None if x is None else x > y for x in c]),
+    '>=': _maybeConstant(lambda c, y: [None if x is None else x >= y for x in c]),
+}
+
+
+def _convert(converter, function):
+    """
+    Builds a whole-column kernel for a conversion, converting the column at once when every value allows it.
+
+    :param converter: f(value) raising ValueError or TypeError on invalid values (e.g. float)
+    :param function: the JTL function returning null on invalid values (e.g. Functions.to_float)
+    :return: f(column)
+    """
+    def kernel(column):
+        try:
+            return list(map(converter, column))
+        except (ValueError, TypeError):
+            return [function(x) for x in column]
+    return kernel
+
+
+# Kernels of the unary functions, keyed by the registered function they replace
+unaryKernels = {
+    Functions.to_float: _convert(float, Functions.to_float),
+    Functions.to_int: _convert(int, Functions.to_int),
+}
+
+# The maybe functions of Functions, keyed by their registered wrapper, to call them without the wrapper on each value
+_maybeFunctions = {}
+# The functions of single numbers behind the element-wise maybe functions, for columns without lists
+_numberFunctions = {}
+for _name, _function in Functions.maybeFunctions.items():
+    _maybeFunctions[Functions.functions[_name]] = _function
+    _numberFunctions[_function] = getattr(_function, '__wrapped__', _function)
+
+
+def _applyOperation(column, operation, batch):
+    """
+    Applies one compiled operation to a column.
+
+    :param column: list of values
+    :param operation: compiled operation of an Interpreter.CompiledExpression
+    :param batch: _Batch (to resolve path arguments)
+    :return: list of values
+    """
+    name, function, arguments, constants = operation
+    # Functions registered again since are called as they are
+    maybe = _maybeFunctions.get(function)
+    if maybe is not None and list not in set(map(type, column)):
+        maybe = _numberFunctions[maybe]
+
+    if constants is not None:
+        if not constants:
+            kernel = unaryKernels.get(function)
+            if kernel is not None:
+                return kernel(column)
+            if maybe is not None:
+                f = maybe
+                return [None if x is None else f(x) for x in column]
+            return [function(x) for x in column]
+        if maybe is not None and len(constants) == 1 and name in constantKernels:
+            result = constantKernels[name](column, constants[0])
+            if result is not None:
+                return result
+        if maybe is not None:
+            if None in constants:
+                return [None] * batch.size
+            f = maybe
+            return [None if x is None else f(x, *constants) for x in column]
+        return [function(x, *constants) for x in column]
+
+    # Path arguments: one column per argument
+    argumentColumns = [[argument.value] * batch.size if isinstance(argument, Parser.Constant)
+                       else batch.column(argument.keys) for argument in arguments]
+    if maybe is not None:
+        f = maybe
+        return [None if x is None or None in args else f(x, *args) for x, args in zip(column, zip(*argumentColumns))]
+    return [function(x, *args) for x, args in zip(column, zip(*argumentColumns))]
+
+
+class ColumnarTransform(object):
+    """
+    A template compiled to be evaluated over batches of records stored as columns.
+    """
+    __slots__ = ('compiled',)
+
+    def __init__(self, compiled):
+        """
+        :param compiled: Interpreter.CompiledTransform without shared expressions (compiled with optimize=False)
+        """
+        self.compiled = compiled
+
+    def apply_columns(self, columns, size=None):
+        """
+        Transforms a batch of records stored as columns into columns.
+
+        :param columns: dict from period separated paths to lists of values
+        :param size: int number of records, only needed when there are no input columns
+        :return: dict from period separated output paths to lists of values ('' when the template is not a dict)
+        """
+        size = _batchSize(columns, size)
+        output = {}
+        _outputColumns(self.compiled.root, _Batch(columns, size), '', output)
+        return output
+
+    def apply_rows(self, columns, size=None):
+        """
+        Transforms a batch of records stored as columns into a list of transformed records.
+
+        :param columns: dict from period separated paths to lists of values
+        :param size: int number of records, only needed when there are no input columns
+        :return: list of transformed records
+        """
+        return _evaluate(self.compiled.root, _Batch(columns, _batchSize(columns, size)))
+
+    def required_columns(self):
+        """
+        Lists the input columns read by the template.
+
+        :return: list of period separated paths ('*' for the whole records)
+        """
+        return sorted('.'.join(keys) if keys else RECORDS for keys in self.compiled.required_paths())
+
+
+def _batchSize(columns, size):
+    sizes = set(len(column) for column in columns.values())
+    if size is not None:
+        sizes.add(size)
+    if len(sizes) > 1:
+        raise ValueError('columns of different lengths: %s' % sorted(sizes))
+    return sizes.pop() if sizes else 0
+
+
+class _Batch(object):
+    """
+    The input columns of one evaluation, with the columns of longer paths extracted once.
+    """
+    __slots__ = ('columns', 'size', 'extracted')
+
+    def __init__(self, columns, size):
+        self.columns = columns
+        self.size = size
+        self.extracted = {}
+
+    def column(self, keys):
+        """
+        Returns the values of a path for every record.
+
+        :param keys: tuple of keys, empty for the whole records
+        :return: list of values
+        """
+        path = '.'.join(keys) if keys else RECORDS
+        column = self.columns.get(path)
+        if column is not None:
+            return column
+        column = self.extracted.get(path)
+        if column is not None:
+            return column
+
+        if not keys:
+            column = _records(self.columns, self.size)
+        else:
+            # Index the values of the longest stored prefix, or of the whole records
+            for length in range(len(keys) - 1, 0, -1):
+                if '.'.join(keys[:length]) in self.columns:
+                    break
+            else:
+                length = 0
+            get = Utility.CompiledPath('.'.join(keys[length:])).get
+            column = [get(value) for value in self.column(keys[:length])]
+        self.extracted[path] = column
+        return column
+
+
+def _records(columns, size):
+    """
+    Builds back the records of a batch from its columns.
+
+    :param columns: dict from period separated paths to lists of values
+    :param size: int number of records
+    :return: list of dict
+    """
+    records = [{} for _ in range(size)]
+    for path, column in sorted(columns.items()):
+        keys = path.split('.')
+        for record, value in zip(records, column):
+            for key in keys[:-1]:
+                record = record.setdefault(key, {})
+            record[keys[-1]] = value
+    return records
+
+
+def _evaluateExpression(expression, batch):
+    """
+    Evaluates a compiled expression over a batch.
+
+    :param expression: Interpreter.CompiledExpression
+    :param batch: _Batch
+    :return: list of values
+    """
+    selector = expression.selector
+    if isinstance(selector, Optimizer.FoldedValue):
+        column = [selector.get(None) for _ in range(batch.size)]
+    elif selector is None:
+        operations = expression.operations
+        if operations and operations[0][0] in Functions.inputlessFunctions:
+            column = [None] * batch.size
+        else:
+            column = batch.column(())
+    else:
+        column = batch.column(selector.keys)
+    for operation in expression.operations:
+        column = _applyOperation(column, operation, batch)
+    return column
+
+
+def _evaluate(node, batch):
+    """
+    Evaluates a node of a template over a batch.
+
+    :param node: evaluation node
+    :param batch: _Batch
+    :return: list of values, one per record
+    """
+    if isinstance(node, Interpreter.DictNode):
+        children = [_evaluate(child, batch) for child in node.children]
+        keys = node.keys
+        return [dict(zip(keys, values)) for values in zip(*children)] if children else [{} for _ in range(batch.size)]
+    elif isinstance(node, Interpreter.ListNode):
+        children = [_evaluate(child, batch) for child in node.children]
+        return [list(values) for values in zip(*children)] if children else [[] for _ in range(batch.size)]
+    elif isinstance(node, Interpreter.FunctionNode):
+        function = node.function
+        params = node.params
+        return [function(value, **params) for value in _evaluate(node.source, batch)]
+    elif isinstance(node, Interpreter.ExpressionNode):
+        return _evaluateExpression(node.expression, batch)
+    return [node.value] * batch.size
+
+
+def _outputColumns(node, batch, path, output):
+    """
+    Evaluates a template over a batch into output columns.
+
+    :param node: evaluation node
+    :param batch: _Batch
+    :param path: str output path of the node
+    :param output: dict from output paths to lists of values, filled in
+    """
+    if isinstance(node, Interpreter.DictNode) and node.children:
+        for key, child in zip(node.keys, node.children):
+            _outputColumns(child, batch, '%s.%s' % (path, key) if path else str(key), output)
+    else:
+        output[path] = _evaluate(node, batch)
+
+
+def compileColumnar(transformData):
+    """
+    Compiles a template to be evaluated over batches of records stored as columns.
+
+    :param transformData: dict | list | str | tuple
+    :return: ColumnarTransform
+    """
+    return ColumnarTransform(Interpreter.compileTemplate(transformData, optimize=False))
+
+
+def toColumns(records, paths):
+    """
+    Stores a list of records as columns.
+
+    :param records: list of dict
+    :param paths: iterable of period separated paths ('*' for the whole records)
+    :return: dict from paths to lists of values
+    """
+    columns = {}
+    for path in paths:
+        if path == RECORDS:
+            columns[path] = list(records)
+        else:
+            get = Utility.CompiledPath(path).get
+            columns[path] = [get(record) for record in records]
+    return columns
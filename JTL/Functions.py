@@ -20,9 +20,6 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 
-import binascii
-import hashlib
-import hmac
 import math
 from JTL import json_util
 
@@ -70,7 +67,62 @@ def to_number(data):
     return float_value
 
 
-functions = {
+class FunctionRegistry(dict):
+    """
+    The functions of JTL by name. Families of rarely used functions (hashing, dates) are only imported on the first
+    lookup of one of their names, so starting JTL stays cheap.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(FunctionRegistry, self).__init__(*args, **kwargs)
+        # Names of the functions not loaded yet, with the loader of their family
+        self.lazyNames = {}
+
+    def addFamily(self, names, loader):
+        """
+        Declares a family of functions loaded on demand.
+
+        :param names: iterable of function names
+        :param loader: f() adding the functions to the registry
+        """
+        for name in names:
+            self.lazyNames[name] = loader
+
+    def load(self, name):
+        """
+        Loads the family of a function name if it was not loaded yet.
+
+        :param name: function name
+        :return: True if a family was loaded
+        """
+        loader = self.lazyNames.get(name)
+        if loader is None:
+            return False
+        for other in [other for other, otherLoader in self.lazyNames.items() if otherLoader is loader]:
+            del self.lazyNames[other]
+        loader()
+        return True
+
+    def loadAll(self):
+        """Loads every family, e.g. to list all the functions."""
+        while self.lazyNames:
+            self.load(next(iter(self.lazyNames)))
+
+    def __missing__(self, name):
+        if self.load(name) and dict.__contains__(self, name):
+            return dict.__getitem__(self, name)
+        raise KeyError(name)
+
+    def __contains__(self, name):
+        return dict.__contains__(self, name) or (self.load(name) and dict.__contains__(self, name))
+
+    def get(self, name, default=None):
+        if name in self:
+            return dict.__getitem__(self, name)
+        return default
+
+
+functions = FunctionRegistry({
     # Any
     'toBool': to_bool,
     'toFloat': to_float,
@@ -96,10 +148,10 @@ functions = {
     'list': lambda x, *args: list(args),  # not include first element
     'rmNull': lambda args: [a for a in args if a is not None],
 
-    # String
+    # String (toString of type_change if it was loaded, without loading it)
     'join': lambda s, sep='': sep.join(
-        [functions.get('toString', str)(t) for t in s if t is not None]) if isinstance(s, (tuple, list)) else None,
-}
+        [dict.get(functions, 'toString', str)(t) for t in s if t is not None]) if isinstance(s, (tuple, list)) else None,
+})
 
 
 # ######### Maybe Functions ##########
@@ -186,9 +238,196 @@ maybeFunctions = {
     'unwords': lambda s: ' '.join(s),
 }
 
+
+# ######### Element-wise Functions ##########
+
+# Maybe functions also registered element-wise, under their name prefixed by each (each*, eachSqrt...), with the
+# name of the matching numpy ufunc. Applied to a list of numbers, they give the list of the results.
+elementwiseFunctions = {
+    '+': 'add',
+    '-': 'subtract',
+    '*': 'multiply',
+    '/': 'true_divide',
+    '**': 'power',
+    '%': 'remainder',
+
+    '==': 'equal',
+    '!=': 'not_equal',
+    '<': 'less',
+    '<=': 'less_equal',
+    '>': 'greater',
+    '>=': 'greater_equal',
+
+    'isFinite': 'isfinite',
+    'isNan': 'isnan',
+
+    'abs': 'absolute',
+    'ceil': None,  # math.ceil returns integers
+    'cos': 'cos',
+    'cosh': 'cosh',
+    'erf': None,
+    'exp': 'exp',
+    'floor': None,
+    'lg': 'log2',
+    'ln': 'log',
+    'log': 'log10',
+    'sin': 'sin',
+    'sinh': 'sinh',
+    'sqrt': 'sqrt',
+    'tan': 'tan',
+    'tanh': 'tanh',
+}
+
+# Shorter lists are faster in pure Python than converted to numpy arrays
+NUMPY_MIN_LENGTH = 64
+
+# Integers numpy converts to float64 exactly
+_EXACT_FLOAT_INT = 2 ** 53
+
+# numpy, imported the first time a long list of floats is computed: None before, False when it is not installed
+_numpy = None
+
+
+def _loadNumpy():
+    """
+    Imports numpy on first use, so importing JTL does not pay for it.
+
+    :return: the numpy module, or False when it is not installed
+    """
+    global _numpy
+    if _numpy is None:
+        try:
+            import numpy
+            _numpy = numpy
+        except ImportError:
+            _numpy = False
+    return _numpy
+
+
+def _numericKind(value):
+    """
+    Tells if a value is a list of numbers, allowing nulls.
+
+    :param value: any value
+    :return: 'float' when every element is a float or null, 'number' when some are integers, None otherwise
+    """
+    if not isinstance(value, list) or not value:
+        return None
+    types = set(map(type, value))
+    types.discard(type(None))
+    if types <= {float}:
+        return 'float'
+    if types <= {int, float}:
+        return 'number'
+    return None
+
+
+def _numpyApply(ufunc, values, *args):
+    """
+    Applies a numpy ufunc to a list of floats and nulls (null elements stay null).
+
+    :param ufunc: str name of the numpy ufunc
+    :param values: list of float | None
+    :param args: scalar arguments
+    :return: list, or None when numpy is not installed or raised a floating point error (the Python functions raise
+        the right error)
+    """
+    numpy = _loadNumpy()
+    if not numpy:
+        return None
+    ufunc = getattr(numpy, ufunc)
+    mask = [v is None for v in values]
+    masked = any(mask)
+    if masked:
+        values = [0.0 if v is None else v for v in values]
+    try:
+        with numpy.errstate(all='raise'):
+            result = ufunc(numpy.array(values, dtype=float), *args).tolist()
+    except (FloatingPointError, OverflowError):
+        return None
+    if masked:
+        result = [None if m else r for r, m in zip(result, mask)]
+    return result
+
+
+def _applyElementwise(function, ufunc, value, args):
+    """
+    Applies a function of a number to each element of a list of numbers, null elements staying null.
+
+    :param function: f(number, *args)
+    :param ufunc: str name of the numpy ufunc computing the same, or None
+    :param value: list
+    :param args: arguments of the function
+    :return: list, or the result of the function on the value itself when it is not a list of numbers
+    """
+    if args:
+        argument = args[0]
+        if len(args) != 1 or type(argument) not in (int, float):
+            return function(value, *args)
+    kind = _numericKind(value)
+    if kind is None:
+        return function(value, *args)
+    if (kind == 'float' and ufunc is not None and len(value) >= NUMPY_MIN_LENGTH
+            and (not args or type(argument) is float or -_EXACT_FLOAT_INT < argument < _EXACT_FLOAT_INT)):
+        result = _numpyApply(ufunc, value, *args)
+        if result is not None:
+            return result
+    return [None if v is None else function(v, *args) for v in value]
+
+
+def elementwise(function, ufunc=None):
+    """
+    Wraps a function of a number so a list of numbers is transformed element by element, null elements staying null.
+
+    Long lists of floats use the numpy ufunc when numpy is installed, and other values are passed to the function as
+    they are (so lists are still concatenated by each+).
+
+    :param function: f(number) or f(number, number)
+    :param ufunc: str name of the numpy ufunc computing the same, or None
+    :return: f(value, *args)
+    """
+    def f(value, *args):
+        if type(value) is not list:
+            return function(value, *args)
+        return _applyElementwise(function, ufunc, value, args)
+    f.__wrapped__ = function
+    return f
+
+
+def maybeElementwise(function, ufunc=None):
+    """
+    Same as maybe(elementwise(function, ufunc)), without the extra call on single values.
+
+    :param function: f(number) or f(number, number)
+    :param ufunc: str name of the numpy ufunc computing the same, or None
+    :return: f(value, *args)
+    """
+    def f(value, *args):
+        if value is None or None in args:
+            return None
+        if type(value) is not list:
+            return function(value, *args)
+        return _applyElementwise(function, ufunc, value, args)
+    return f
+
+
+def elementwiseName(name):
+    """
+    Returns the name of the element-wise version of a function: each+, eachSqrt...
+
+    :param name: str name of the function
+    :return: str
+    """
+    return 'each' + (name[0].upper() + name[1:] if name[0].isalpha() else name)
+
+
 for name in maybeFunctions:
+    functions[name] = maybe(maybeFunctions[name])
+
+for name, ufunc in elementwiseFunctions.items():
     function = maybeFunctions[name]
-    functions[name] = maybe(function)
+    functions[elementwiseName(name)] = maybeElementwise(function, ufunc)
+    maybeFunctions[elementwiseName(name)] = elementwise(function, ufunc)
 
 
 # ######### Hash Functions ##########
@@ -201,6 +440,8 @@ def hashFunction(hashConstructor):
     :return: f(str)
     """
 
+    import binascii
+
     def f(s):
         if s is None:
             return None
@@ -218,6 +459,7 @@ def hmacFunction(hashConstructor):
     :param hashConstructor: hashing algorithm (e.g. hashlib.md5)
     :return: hmac(str, key)
     """
+    import hmac
 
     def h(message, key):
         key = json_util.encode2bytes(key)
@@ -227,59 +469,159 @@ def hmacFunction(hashConstructor):
     return h
 
 
-hashFunctions = {
-    'md5': hashlib.md5,
-    'sha1': hashlib.sha1,
-    'sha224': hashlib.sha224,
-    'sha256': hashlib.sha256,
-    'sha384': hashlib.sha384,
-    'sha512': hashlib.sha512,
+# Algorithms of hashlib with a hash function and an HMAC function
+hashAlgorithms = ('md5', 'sha1', 'sha224', 'sha256', 'sha384', 'sha512')
+hashFunctionNames = [name for algorithm in hashAlgorithms for name in (algorithm, 'hmac_%s' % algorithm)]
+
+
+def _loadHashFunctions():
+    import hashlib
+    for algorithm in hashAlgorithms:
+        constructor = getattr(hashlib, algorithm)
+        functions.setdefault(algorithm, hashFunction(constructor))
+        functions.setdefault('hmac_%s' % algorithm, hmacFunction(constructor))
+
+
+def _loadTypeChangeFunctions():
+    # Registers its functions when imported
+    import JTL.type_change
+
+
+functions.addFamily(hashFunctionNames, _loadHashFunctions)
+functions.addFamily(('toString', 'dateToString', 'datetimeToString', 'toDate', 'toDatetime', 'countAge'),
+                    _loadTypeChangeFunctions)
+
+
+# Names of the functions whose result only depends on their arguments, so compiled templates may share their results
+# Functions read from files or the clock must stay out of it
+pureFunctions = set(functions)
+pureFunctions.update(hashFunctionNames)
+pureFunctions.discard('enumFileChange')
+
+# Names of the functions that ignore the value they are applied to, so their result only depends on their arguments
+inputlessFunctions = {'list', 'null'}
+
+# Functions whose first argument, when constant, is prepared once when an expression is compiled: the inline enums
+# are parsed and indexed once per distinct literal instead of on every record
+compiledArguments = {
+    'enumChange': json_util.enum_table,
+    'enumOrKey': json_util.enum_table,
 }
 
-for name in hashFunctions:
-    function = hashFunctions[name]
-    functions[name] = hashFunction(function)
-    functions['hmac_%s' % name] = hmacFunction(function)
+# Bumped whenever the registry changes, so compiled expressions holding function references can be discarded
+registryVersion = 0
 
 
-def register(operation, function):
-    """add a function to JTL.
+def isPure(operation):
+    """
+    Returns True if the registered function only depends on its arguments.
+
     :param operation: function name, the operation in JTL
+    :return: bool
+    """
+    return operation in pureFunctions
+
+
+def ioBound(function):
+    """mark a function as I/O bound (files, caches, services...).
+    given an executor, the compiled templates run it concurrently when it is used in a tuple template value.
     :param function: the function.
+    :return: the same function
+    """
+    function.jtlIoBound = True
+    return function
+
+
+def isIoBound(function):
+    """
+    Returns True if the function was marked with ioBound.
+
+    :param function: the function
+    :return: bool
     """
-    global functions
+    return getattr(function, 'jtlIoBound', False)
+
+
+# Functions registered at runtime by name, as (function, maybe, pure), so worker processes can register them again
+registrations = {}
+
+
+def _setFunction(operation, function, pure):
+    global registryVersion
+    # A family loaded later must not replace this function
+    functions.load(operation)
     functions[operation] = function
+    if pure:
+        pureFunctions.add(operation)
+    else:
+        pureFunctions.discard(operation)
+    registryVersion += 1
 
 
-def register_maybe(operation, function):
+def register(operation, function, pure=False):
+    """add a function to JTL.
+    :param operation: function name, the operation in JTL
+    :param function: the function.
+    :param pure: True if the result only depends on the arguments (no clock, files or side effects).
+    """
+    _setFunction(operation, function, pure)
+    registrations[operation] = (function, False, pure)
+
+
+def register_maybe(operation, function, pure=False):
     """add a maybe function to JTL.
     if null in args return null.
     :param operation: function name, the operation in JTL
     :param function: the function.
+    :param pure: True if the result only depends on the arguments (no clock, files or side effects).
     """
-    global functions
-    functions[operation] = maybe(function)
+    _setFunction(operation, maybe(function), pure)
+    registrations[operation] = (function, True, pure)
 
 
-def registerFunction(operation):
+def unregister(operation):
+    """remove a function from JTL, with its registration.
+    compiled templates using it are discarded, like when a function is registered.
+    :param operation: function name, the operation in JTL
+    """
+    global registryVersion
+    # A family loaded later must not bring it back
+    functions.load(operation)
+    dict.pop(functions, operation, None)
+    pureFunctions.discard(operation)
+    registrations.pop(operation, None)
+    registryVersion += 1
+
+
+def registerAll(registered):
+    """register again the functions of another process.
+    :param registered: dict like registrations
+    """
+    for operation, (function, isMaybe, pure) in registered.items():
+        if isMaybe:
+            register_maybe(operation, function, pure)
+        else:
+            register(operation, function, pure)
+
+
+def registerFunction(operation, pure=False):
     """add a function to JTL.
     :param operation: function name, the operation in JTL
+    :param pure: True if the result only depends on the arguments (no clock, files or side effects).
     """
     def wrap(function):
-        global functions
-        functions[operation] = function
+        register(operation, function, pure)
         return function
     return wrap
 
 
-def registerMaybeFunction(operation):
+def registerMaybeFunction(operation, pure=False):
     """add a maybe function to JTL.
     if null in args return null.
     :param operation: function name, the operation in JTL
+    :param pure: True if the result only depends on the arguments (no clock, files or side effects).
     """
     def wrap(function):
-        global functions
-        functions[operation] = maybe(function)
+        register_maybe(operation, function, pure)
         return functions[operation]
     return wrap
-
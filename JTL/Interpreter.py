@@ -20,10 +20,68 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 
-import types
+import collections.abc
+import itertools
 from JTL import Functions
+from JTL import Optimizer
 from JTL import Parser
 from JTL import Utility
+from JTL import json_util
+
+
+def indexOperation(index):
+    """
+    Builds the operation for a simple integer index, e.g. `$ 2`.
+
+    :param index: int
+    :return: f(value, *args)
+    """
+    def f(value, *args):
+        # Do not raise IndexError: list index out of range
+        if value is not None and len(value) - 1 >= index:
+            return value[index]
+        return None
+
+    return f
+
+
+def selectorOperation(path):
+    """
+    Builds the operation for a selector function, e.g. `$ .abc.def`.
+
+    :param path: str path without the leading period
+    :return: f(value)
+    """
+    return Utility.CompiledPath(path).get
+
+
+def resolveOperation(operation, argumentCount, location):
+    """
+    Finds the function implementing an operation.
+
+    :param operation: str name of the operation (from the tokenizer)
+    :param argumentCount: int number of arguments passed to the operation
+    :param location: str output key (used for error reporting)
+    :return: f(value, *args)
+    """
+    function = Functions.functions.get(operation)
+    if function is not None:
+        return function
+
+    # Is it a simple integer index?
+    index = Functions.to_int(operation)
+    if index is not None:
+        return indexOperation(index)
+
+    # Or perhaps it's a selector function? .abc.def
+    if operation[0] == '.':
+        if argumentCount == 0:
+            return selectorOperation(operation[1:])
+        else:
+            raise SyntaxError('selector  %s  has arguments in "%s" (did you mean to do an operation?)' % (operation[0], location))
+
+    # Nothing found -- error!
+    raise NameError('cannot find operation  %s  in "%s"' % (operation, location))
 
 
 def applyOperation(value, operation, args, location):
@@ -35,77 +93,196 @@ def applyOperation(value, operation, args, location):
     :param args: [str] argument tokens
     :return: a valid JSON value
     """
-    function = Functions.functions.get(operation)
-    if function is None:
-        # Is it a simple integer index?
-        index = Functions.to_int(operation)
-        if index is not None:
-            # Do not raise IndexError: list index out of range
-            if value is not None and len(value) - 1 >= index:
-                return value[index]
+    return resolveOperation(operation, len(args), location)(value, *args)
+
+
+class CompiledExpression(object):
+    """
+    A JTL expression parsed once into a plan that can be evaluated against many inputs.
+    """
+    __slots__ = ('source', 'selector', 'operations')
+
+    def __init__(self, source, selector, operations):
+        """
+        :param source: str JTL expression
+        :param selector: Utility.CompiledPath primary selector (or any object with get(data)), or None to start from
+            the whole input
+        :param operations: [(str, f, (Constant | PathArgument), tuple | None)] operation names, resolved functions,
+            compiled arguments and, when every argument is a constant, their values
+        """
+        self.source = source
+        self.selector = selector
+        self.operations = operations
+
+    def evaluate(self, data, location=''):
+        """
+        Computes the expression on some input data.
+
+        :param data: dict
+        :param location: str output key (used for error reporting)
+        :return: a valid JSON value
+        """
+        value = data if self.selector is None else self.selector.get(data)
+        for operation, function, arguments, constants in self.operations:
+            if constants is None:
+                value = function(value, *[argument.resolve(data) for argument in arguments])
             else:
-                return None
+                value = function(value, *constants)
+        return value
+
+    def evaluateFrom(self, value, data):
+        """
+        Applies the operations of the expression to a value, ignoring the selector.
 
-        # Or perhaps it's a selector function? .abc.def
-        if operation[0] == '.':
-            if len(args) == 0:
-                return Utility.extractPath(value, operation[1:])
+        :param value: a valid JSON value
+        :param data: dict of original data to resolve path arguments
+        :return: a valid JSON value
+        """
+        for operation, function, arguments, constants in self.operations:
+            if constants is None:
+                value = function(value, *[argument.resolve(data) for argument in arguments])
             else:
-                raise SyntaxError('selector  %s  has arguments in "%s" (did you mean to do an operation?)' % (operation[0], location))
+                value = function(value, *constants)
+        return value
 
-        # Nothing found -- error!
-        raise NameError('cannot find operation  %s  in "%s"' % (operation, location))
+    async def evaluateAsync(self, data):
+        """
+        Computes the expression on some input data, awaiting the operations returning awaitables.
 
-    return function(value, *args)
+        :param data: dict
+        :return: a valid JSON value
+        """
+        value = data if self.selector is None else self.selector.get(data)
+        return await self.evaluateFromAsync(value, data)
 
+    async def evaluateFromAsync(self, value, data):
+        """
+        Applies the operations of the expression to a value, ignoring the selector, awaiting the operations
+        returning awaitables.
 
-def transform(data, transformData, location=''):
+        :param value: a valid JSON value
+        :param data: dict of original data to resolve path arguments
+        :return: a valid JSON value
+        """
+        for operation, function, arguments, constants in self.operations:
+            if constants is None:
+                value = function(value, *[argument.resolve(data) for argument in arguments])
+            else:
+                value = function(value, *constants)
+            if isinstance(value, collections.abc.Awaitable):
+                value = await value
+        return value
+
+
+# Compiled expressions keyed by their JTL source, shared by every transform call
+TRANSFORM_CACHE_SIZE = 4096
+transformCache = Utility.LRUCache(TRANSFORM_CACHE_SIZE)
+_transformCacheVersion = Functions.registryVersion
+
+
+def compileTransform(transformData, location=''):
     """
-    Computes one single transformation on some input data.
+    Compiles a JTL expression into a CompiledExpression, reusing a cached one when possible.
 
-    :param data: dict
     :param transformData: str JTL expression
     :param location: str output key (used for error reporting)
-    :return: a valid JSON value
+    :return: CompiledExpression
     """
-    if not transformData:
-        return None
+    global _transformCacheVersion
+    # Cached expressions hold function references, so they go stale when the registry changes
+    if _transformCacheVersion != Functions.registryVersion:
+        transformCache.clear()
+        _transformCacheVersion = Functions.registryVersion
+
+    compiled = transformCache.get(transformData)
+    if compiled is None:
+        compiled = _compileTransform(transformData, location)
+        transformCache.put(transformData, compiled)
+    return compiled
 
+
+def _compileTransform(transformData, location):
+    """
+    Parses a JTL expression into a CompiledExpression without consulting the cache.
+
+    :param transformData: str JTL expression
+    :param location: str output key (used for error reporting)
+    :return: CompiledExpression
+    """
     # * As a special symbol, all values are returned as they are, for use by external functions.
     if transformData == '*':
-        return data
+        return CompiledExpression(transformData, None, [])
 
     # Parse the transformation into tokens
     tokens = Parser.parseTransform(transformData)
-    if len(tokens) == 0:
-        return None
 
     if len(tokens[0]) == 0 or tokens[0][0] == '*':
-        value = data
+        selector = None
     else:
-        primarySelector = tokens[0][0]
-        value = Utility.extractPath(data, primarySelector)
+        selector = Utility.CompiledPath(tokens[0][0])
 
+    operations = []
     for n, section in enumerate(tokens[1:]):
         if len(section) == 0:
             # n is the previous token
             raise SyntaxError('missing final operation after  %s  in "%s"' % (tokens[n][0], location))
-
         operation = section[0]
-        args = [Parser.parseArgument(argument, data) for argument in section[1:]]
-        value = applyOperation(value, operation, args, location)
+        function = resolveOperation(operation, len(section) - 1, location)
+        arguments = tuple(Parser.compileArgument(argument) for argument in section[1:])
+        if all(isinstance(argument, Parser.Constant) for argument in arguments):
+            constants = _compileConstants(operation, tuple(argument.value for argument in arguments))
+        else:
+            constants = None
+        operations.append((operation, function, arguments, constants))
+
+    return Optimizer.foldConstants(CompiledExpression(transformData, selector, operations))
+
+
+def _compileConstants(operation, constants):
+    """
+    Prepares the constant arguments of a built-in operation once (see Functions.compiledArguments).
+
+    :param operation: str operation name
+    :param constants: tuple of argument values
+    :return: tuple of argument values
+    """
+    compileArgument = Functions.compiledArguments.get(operation)
+    if compileArgument is None or not constants or operation in Functions.registrations:
+        return constants
+    try:
+        return (compileArgument(constants[0]),) + constants[1:]
+    except Exception:
+        # Invalid arguments fail on each record, as they would without compiling them
+        return constants
+
+
+def transform(data, transformData, location=''):
+    """
+    Computes one single transformation on some input data.
+
+    :param data: dict
+    :param transformData: str JTL expression
+    :param location: str output key (used for error reporting)
+    :return: a valid JSON value
+    """
+    if not transformData:
+        return None
 
-    return value
+    return compileTransform(transformData, location).evaluate(data, location)
 
 
-def transformJson(data, transformData, location=''):
+def transformJson(data, transformData, location='', executor=None):
     """
     Transforms some input data based on a transformation (transformData).
 
     :param data: dict
-    :param transformData: dict | list | str | tuple
+    :param transformData: dict | list | str | tuple, or a CompiledTransform
+    :param executor: concurrent.futures.Executor running the I/O bound tuple functions (see Functions.ioBound)
     :return: dict
     """
+    if executor is not None or isinstance(transformData, CompiledTransform):
+        return cachedTemplate(transformData, executor).apply(data)
+
     if isinstance(transformData, dict):
         result = {}
         for k, v in transformData.items():
@@ -116,20 +293,527 @@ def transformJson(data, transformData, location=''):
         result = transform(data, transformData, location)
     # run the user-defined functions
     elif isinstance(transformData, tuple):
-        _length = len(transformData)
-        if _length == 2:
-            tem_transform, fun = transformData
-            param = {}
-        elif _length == 3:
-            tem_transform, fun, param = transformData
-        else:
-            raise SyntaxError('error parameters')
-        assert isinstance(tem_transform, str)
-        assert isinstance(fun, (types.FunctionType, types.MethodType))
-        assert isinstance(param, dict)
+        tem_transform, fun, param = _unpackFunction(transformData)
         result = transform(data, tem_transform, location)
         result = fun(result, **param)
     # Others return as they are
     else:
         result = transformData
     return result
+
+
+def _unpackFunction(transformData):
+    """
+    Checks a user-defined function template: (expression, function) or (expression, function, params).
+
+    :param transformData: tuple
+    :return: (str, f, dict)
+    """
+    _length = len(transformData)
+    if _length == 2:
+        tem_transform, fun = transformData
+        param = {}
+    elif _length == 3:
+        tem_transform, fun, param = transformData
+    else:
+        raise SyntaxError('error parameters')
+    assert isinstance(tem_transform, str)
+    assert callable(fun)
+    assert isinstance(param, dict)
+    return tem_transform, fun, param
+
+
+# ######### Compiled Templates ##########
+
+
+class ConstantNode(object):
+    """
+    A template value that is not an expression and is returned as it is.
+    """
+    __slots__ = ('value',)
+
+    def __init__(self, value):
+        self.value = value
+
+    def evaluate(self, data, scratch):
+        return self.value
+
+    async def evaluateAsync(self, data, scratch, limiter):
+        return self.value
+
+
+class ExpressionNode(object):
+    """
+    A JTL expression string in a template.
+    """
+    __slots__ = ('expression', 'location')
+
+    def __init__(self, expression, location):
+        self.expression = expression
+        self.location = location
+
+    def evaluate(self, data, scratch):
+        return self.expression.evaluate(data, self.location)
+
+    async def evaluateAsync(self, data, scratch, limiter):
+        return await self.expression.evaluateAsync(data)
+
+
+class FunctionNode(object):
+    """
+    A user-defined function in a template: the value of the source node is passed to the function.
+    """
+    __slots__ = ('source', 'location', 'function', 'params')
+
+    def __init__(self, source, location, function, params):
+        """
+        :param source: node computing the value passed to the function
+        :param location: str output key (used for error reporting)
+        :param function: f(value, **params)
+        :param params: dict
+        """
+        self.source = source
+        self.location = location
+        self.function = function
+        self.params = params
+
+    def evaluate(self, data, scratch):
+        return self.function(self.source.evaluate(data, scratch), **self.params)
+
+    async def evaluateAsync(self, data, scratch, limiter):
+        value = self.function(await self.source.evaluateAsync(data, scratch, limiter), **self.params)
+        if isinstance(value, collections.abc.Awaitable):
+            value = await value
+        return value
+
+
+class ConcurrentFunctionNode(FunctionNode):
+    """
+    A user-defined I/O bound function in a template, submitted to an executor: its value is a future until resolved.
+    """
+    __slots__ = ('executor',)
+
+    def __init__(self, source, location, function, params, executor):
+        """
+        :param executor: concurrent.futures.Executor running the function
+        """
+        super(ConcurrentFunctionNode, self).__init__(source, location, function, params)
+        self.executor = executor
+
+    def evaluate(self, data, scratch):
+        return self.executor.submit(self.function, self.source.evaluate(data, scratch), **self.params)
+
+    async def evaluateAsync(self, data, scratch, limiter):
+        import asyncio
+        value = await self.source.evaluateAsync(data, scratch, limiter)
+        return await asyncio.wrap_future(self.executor.submit(self.function, value, **self.params))
+
+
+class DictNode(object):
+    """
+    A dict in a template, with its output keys built once.
+    """
+    __slots__ = ('keys', 'children')
+
+    def __init__(self, keys, children):
+        self.keys = keys
+        self.children = children
+
+    def evaluate(self, data, scratch):
+        return dict(zip(self.keys, [child.evaluate(data, scratch) for child in self.children]))
+
+    async def evaluateAsync(self, data, scratch, limiter):
+        import asyncio
+        values = await asyncio.gather(*[_evaluateChildAsync(child, data, scratch, limiter) for child in self.children])
+        return dict(zip(self.keys, values))
+
+
+class ListNode(object):
+    """
+    A list in a template.
+    """
+    __slots__ = ('children',)
+
+    def __init__(self, children):
+        self.children = children
+
+    def evaluate(self, data, scratch):
+        return [child.evaluate(data, scratch) for child in self.children]
+
+    async def evaluateAsync(self, data, scratch, limiter):
+        import asyncio
+        return list(await asyncio.gather(*[_evaluateChildAsync(child, data, scratch, limiter)
+                                           for child in self.children]))
+
+
+async def _evaluateChildAsync(node, data, scratch, limiter):
+    """
+    Evaluates a child of a dict or a list, holding the concurrency limiter while evaluating a single value.
+
+    :param node: evaluation node
+    :param data: dict
+    :param scratch: list of the values shared between expressions
+    :param limiter: asyncio.Semaphore | None
+    :return: a valid JSON value
+    """
+    if limiter is None or isinstance(node, (DictNode, ListNode, ConstantNode)):
+        return await node.evaluateAsync(data, scratch, limiter)
+    async with limiter:
+        return await node.evaluateAsync(data, scratch, limiter)
+
+
+def compileNode(transformData, location=''):
+    """
+    Compiles one value of a template into an evaluation node.
+
+    :param transformData: dict | list | str | tuple
+    :param location: str output key (used for error reporting)
+    :return: node with evaluate(data, scratch)
+    """
+    if isinstance(transformData, dict):
+        keys = tuple(transformData.keys())
+        children = tuple(compileNode(v, '%s.%s' % (location, k)) for k, v in transformData.items())
+        return DictNode(keys, children)
+    elif isinstance(transformData, list):
+        return ListNode(tuple(compileNode(v, '%s.%s' % (location, n)) for n, v in enumerate(transformData)))
+    elif isinstance(transformData, str):
+        if not transformData:
+            return ConstantNode(None)
+        return ExpressionNode(compileTransform(transformData, location), location)
+    # run the user-defined functions
+    elif isinstance(transformData, tuple):
+        tem_transform, fun, param = _unpackFunction(transformData)
+        return FunctionNode(compileNode(tem_transform, location), location, fun, param)
+    # Others return as they are
+    return ConstantNode(transformData)
+
+
+class CompiledTransform(object):
+    """
+    A whole template compiled once into an evaluation plan, to be applied to many records.
+
+    Functions are resolved when compiling, so functions registered afterwards need a new compile.
+    """
+    __slots__ = ('template', 'root', 'slots', 'projection', 'futures', 'window')
+
+    def __init__(self, template, root, slots=0, futures=(), window=1):
+        """
+        :param template: dict | list | str | tuple the original template
+        :param root: the root evaluation node
+        :param slots: int number of values shared between expressions, kept per record in a scratch list
+        :param futures: tuple of paths (keys and indexes) of the results computed as futures by an executor
+        :param window: int number of records whose futures run at the same time in apply_many
+        """
+        self.template = template
+        self.root = root
+        self.slots = slots
+        self.projection = Optimizer.UNSET
+        self.futures = futures
+        self.window = window
+
+    def with_executor(self, executor, window=16):
+        """
+        Runs the I/O bound tuple functions (see Functions.ioBound) of the template on an executor, so they overlap
+        across the keys of a record and across records in apply_many.
+
+        :param executor: concurrent.futures.Executor, usually a ThreadPoolExecutor
+        :param window: int number of records whose functions run at the same time in apply_many
+        :return: CompiledTransform
+        """
+        paths = []
+        root = _submitIoBound(self.root, executor, (), paths)
+        return CompiledTransform(self.template, root, self.slots, tuple(paths), max(1, window))
+
+    def _resolve(self, result):
+        """
+        Replaces the futures of a result by their values.
+
+        :param result: the result of the root node
+        :return: the transformed record
+        """
+        for path in self.futures:
+            if not path:
+                return result.result()
+            container = result
+            for key in path[:-1]:
+                container = container[key]
+            container[path[-1]] = container[path[-1]].result()
+        return result
+
+    def required_paths(self):
+        """
+        Lists the paths of the record read by the template.
+
+        :return: set of tuples of keys; an empty tuple means the whole record
+        """
+        return Optimizer.requiredPaths(self.root)
+
+    def input_projection(self):
+        """
+        Returns the tree of the input fields read by the template (see json_util.compile_projection).
+
+        :return: dict | None when the template reads the whole record
+        """
+        if self.projection is Optimizer.UNSET:
+            self.projection = json_util.compile_projection(self.required_paths())
+        return self.projection
+
+    def apply_bytes(self, raw):
+        """
+        Transforms one JSON document, keeping only the fields read by the template once decoded.
+
+        The document is still decoded whole by the json backend in use: the fields dropped are released before the
+        template runs, but decoding takes as long as without projection.
+
+        :param raw: str | bytes JSON document
+        :return: the transformed record
+        :raise ValueError: for invalid JSON
+        """
+        return self.apply(json_util.load_json_projection(raw, self.input_projection()))
+
+    def apply(self, data):
+        """
+        Transforms one record.
+
+        :param data: dict
+        :return: the transformed record
+        """
+        result = self.root.evaluate(data, [Optimizer.UNSET] * self.slots)
+        if self.futures:
+            result = self._resolve(result)
+        return result
+
+    def apply_many(self, records):
+        """
+        Transforms every record of an iterable, lazily.
+
+        :param records: iterable of dict
+        :return: generator of transformed records
+        """
+        evaluate = self.root.evaluate
+        blank = [Optimizer.UNSET] * self.slots
+        scratch = list(blank)
+        if not self.futures:
+            for data in records:
+                scratch[:] = blank
+                yield evaluate(data, scratch)
+            return
+
+        # Keep the futures of the next records running while the oldest one is resolved
+        pending = collections.deque()
+        for data in records:
+            scratch[:] = blank
+            pending.append(evaluate(data, scratch))
+            if len(pending) >= self.window:
+                yield self._resolve(pending.popleft())
+        while pending:
+            yield self._resolve(pending.popleft())
+
+    async def apply_async(self, data, concurrency=None):
+        """
+        Transforms one record, awaiting the functions returning awaitables (coroutine functions), with the keys
+        computed concurrently.
+
+        :param data: dict
+        :param concurrency: int maximum number of values computed at the same time, None for no limit
+        :return: the transformed record
+        """
+        # asyncio is only imported by the asynchronous API, to keep importing JTL fast
+        import asyncio
+        limiter = asyncio.Semaphore(concurrency) if concurrency else None
+        return await self.root.evaluateAsync(data, [Optimizer.UNSET] * self.slots, limiter)
+
+
+def _submitIoBound(node, executor, path, paths):
+    """
+    Rebuilds a node tree with its I/O bound functions submitted to an executor.
+
+    :param node: evaluation node
+    :param executor: concurrent.futures.Executor
+    :param path: tuple of keys and indexes of the node in the result
+    :param paths: list of the paths of the futures in the result, filled in
+    :return: node
+    """
+    if isinstance(node, DictNode):
+        children = tuple(_submitIoBound(child, executor, path + (key,), paths)
+                         for key, child in zip(node.keys, node.children))
+        return DictNode(node.keys, children)
+    elif isinstance(node, ListNode):
+        return ListNode(tuple(_submitIoBound(child, executor, path + (n,), paths)
+                              for n, child in enumerate(node.children)))
+    elif isinstance(node, FunctionNode) and Functions.isIoBound(node.function):
+        paths.append(path)
+        return ConcurrentFunctionNode(node.source, node.location, node.function, node.params, executor)
+    return node
+
+
+def compileTemplate(transformData, optimize=True):
+    """
+    Compiles a whole template (as accepted by transformJson) into a CompiledTransform.
+
+    :param transformData: dict | list | str | tuple
+    :param optimize: bool share the results of common pure sub-expressions between keys
+    :return: CompiledTransform
+    """
+    compiled = CompiledTransform(transformData, compileNode(transformData))
+    if optimize:
+        compiled = Optimizer.optimize(compiled)
+    return compiled
+
+
+# Optimized compiled templates keyed by their content, for the calls transforming one record at a time
+TEMPLATE_CACHE_SIZE = 256
+templateCache = Utility.LRUCache(TEMPLATE_CACHE_SIZE)
+# The same templates bound to an executor (CompiledTransform.with_executor), keyed by (template, executor, window)
+executorTemplateCache = Utility.LRUCache(TEMPLATE_CACHE_SIZE)
+_templateCacheVersion = Functions.registryVersion
+
+
+def _templateKey(transformData):
+    """
+    Returns a hashable key with the content of a template: templates equal as keys compile the same way.
+
+    :param transformData: dict | list | str | tuple
+    :return: tuple
+    :raise TypeError: when a constant of the template is not hashable
+    """
+    if isinstance(transformData, dict):
+        return dict, tuple((type(k), k, _templateKey(v)) for k, v in transformData.items())
+    elif isinstance(transformData, (list, tuple)):
+        return type(transformData), tuple(_templateKey(v) for v in transformData)
+    # The type keeps 1, 1.0 and true apart
+    return type(transformData), transformData
+
+
+def cachedTemplate(transformData, executor=None, window=16):
+    """
+    Compiles a whole template like compileTemplate, reusing a cached one when the same template was compiled before.
+
+    :param transformData: dict | list | str | tuple, or a CompiledTransform
+    :param executor: concurrent.futures.Executor the template is bound to (see CompiledTransform.with_executor), or None
+    :param window: int number of records whose functions run at the same time in apply_many, with an executor
+    :return: CompiledTransform
+    """
+    global _templateCacheVersion
+    # Compiled templates hold function references, so they go stale when the registry changes
+    if _templateCacheVersion != Functions.registryVersion:
+        templateCache.clear()
+        executorTemplateCache.clear()
+        _templateCacheVersion = Functions.registryVersion
+
+    if isinstance(transformData, CompiledTransform):
+        compiled = transformData
+    else:
+        try:
+            key = _templateKey(transformData)
+            hash(key)
+        except TypeError:
+            compiled = compileTemplate(transformData)
+            return compiled if executor is None else compiled.with_executor(executor, window)
+        compiled = templateCache.get(key)
+        if compiled is None:
+            compiled = compileTemplate(transformData)
+            templateCache.put(key, compiled)
+    if executor is None:
+        return compiled
+
+    # The compiled template stands for its content: it stays the same object as long as it is cached
+    key = (compiled, executor, window)
+    bound = executorTemplateCache.get(key)
+    if bound is None:
+        bound = compiled.with_executor(executor, window)
+        executorTemplateCache.put(key, bound)
+    return bound
+
+
+def transformJsonBytes(raw, transformData):
+    """
+    Transforms a JSON document, only keeping the fields read by the transformation once decoded.
+
+    :param raw: str | bytes JSON document
+    :param transformData: dict | list | str | tuple, or a CompiledTransform
+    :return: the transformed record
+    """
+    if not isinstance(transformData, CompiledTransform):
+        transformData = compileTemplate(transformData)
+    return transformData.apply_bytes(raw)
+
+
+def transformMany(records, transformData, workers=None, chunksize=None, ordered=True, executor=None, window=16):
+    """
+    Transforms every record of an iterable (a list, a generator, a DB cursor...) lazily, compiling the template once.
+
+    :param records: iterable of dict
+    :param transformData: dict | list | str | tuple, or a CompiledTransform
+    :param workers: int number of worker processes (see JTL.Parallel), None to transform in this process
+    :param chunksize: int number of records sent to a worker at once
+    :param ordered: bool with workers, yield the results in the order of the records
+    :param executor: concurrent.futures.Executor running the I/O bound tuple functions (see Functions.ioBound)
+    :param window: int with an executor, number of records whose functions run at the same time
+    :return: generator of transformed records
+    """
+    if workers:
+        from JTL import Parallel
+        return Parallel.transformMany(records, transformData, workers, chunksize or Parallel.DEFAULT_CHUNKSIZE, ordered)
+    if not isinstance(transformData, CompiledTransform):
+        transformData = compileTemplate(transformData)
+    if executor is not None:
+        transformData = transformData.with_executor(executor, window)
+    return transformData.apply_many(records)
+
+
+def transformChunks(records, transformData, size, workers=None, ordered=True):
+    """
+    Transforms every record of an iterable lazily, yielding the results by lists of at most size records.
+
+    :param records: iterable of dict
+    :param transformData: dict | list | str | tuple, or a CompiledTransform
+    :param size: int number of records per list
+    :param workers: int number of worker processes (see JTL.Parallel), each list being transformed by one of them
+    :param ordered: bool with workers, yield the lists in the order of the records
+    :return: generator of lists of transformed records
+    """
+    if size < 1:
+        raise ValueError('chunk size must be positive, got %s' % size)
+    if workers:
+        from JTL import Parallel
+        yield from Parallel.transformChunks(records, transformData, workers, size, ordered)
+        return
+    results = transformMany(records, transformData)
+    while True:
+        chunk = list(itertools.islice(results, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+async def transformJsonAsync(data, transformData, concurrency=None):
+    """
+    Transforms some input data based on a transformation, awaiting the tuple functions and registered functions
+    returning awaitables. The keys of the transformation are computed concurrently.
+
+    :param data: dict
+    :param transformData: dict | list | str | tuple, or a CompiledTransform
+    :param concurrency: int maximum number of values computed at the same time, None for no limit
+    :return: the transformed record
+    """
+    return await cachedTemplate(transformData).apply_async(data, concurrency)
+
+
+async def transformManyAsync(records, transformData, concurrency=None):
+    """
+    Transforms every record of an iterable or an asynchronous iterable lazily, compiling the template once.
+
+    :param records: iterable | async iterable of dict
+    :param transformData: dict | list | str | tuple, or a CompiledTransform
+    :param concurrency: int maximum number of values of a record computed at the same time, None for no limit
+    :return: async generator of transformed records
+    """
+    if not isinstance(transformData, CompiledTransform):
+        transformData = compileTemplate(transformData)
+    if hasattr(records, '__aiter__'):
+        async for data in records:
+            yield await transformData.apply_async(data, concurrency)
+    else:
+        for data in records:
+            yield await transformData.apply_async(data, concurrency)
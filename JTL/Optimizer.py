@@ -0,0 +1,366 @@
+# -*- coding:utf-8 -*-
+
+# Copyright (c) 2015-2021 Agalmic Ventures LLC (www.agalmicventures.com)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import collections.abc
+import copy
+import types
+
+from JTL import Functions
+from JTL import Interpreter
+from JTL import Parser
+
+
+# Marks the scratch slots of a record that have not been computed yet
+UNSET = object()
+
+
+class FoldedValue(object):
+    """
+    Replaces the selector of an expression whose first operations were computed when compiling.
+    """
+    __slots__ = ('value', 'mutable')
+
+    def __init__(self, value):
+        self.value = value
+        self.mutable = isinstance(value, (dict, list, set))
+
+    def get(self, data):
+        # Every record gets its own copy of a mutable result
+        return copy.deepcopy(self.value) if self.mutable else self.value
+
+
+def foldConstants(expression):
+    """
+    Computes, when compiling, the leading operations of an expression that do not depend on the record: an operation
+    ignoring its input (like list or null) followed by pure operations, all with constant arguments.
+
+    :param expression: Interpreter.CompiledExpression
+    :return: Interpreter.CompiledExpression
+    """
+    folded = 0
+    value = None
+    for name, function, arguments, constants in expression.operations:
+        if constants is None or not isPureOperation(name):
+            break
+        if name in Functions.inputlessFunctions:
+            value = None
+        elif folded == 0:
+            # The selector depends on the record
+            break
+        try:
+            result = function(value, *constants)
+        except Exception as e:
+            # Leave it to fail on each record, as it would without folding
+            break
+        if isinstance(result, collections.abc.Awaitable):
+            # Asynchronous functions are awaited on each record
+            if isinstance(result, types.CoroutineType):
+                result.close()
+            break
+        value = result
+        folded += 1
+
+    if folded == 0:
+        return expression
+    return Interpreter.CompiledExpression(expression.source, FoldedValue(value), expression.operations[folded:])
+
+
+class SharedValue(object):
+    """
+    A selector and operation prefix used by several expressions of a template, computed at most once per record.
+    """
+    __slots__ = ('index', 'parent', 'expression', 'end')
+
+    def __init__(self, index, parent, expression, end):
+        """
+        :param index: int slot of the value in the scratch list of a record
+        :param parent: SharedValue this one continues from, or None to start from the selector of the expression
+        :param expression: Interpreter.CompiledExpression computing the value (from the parent value if any)
+        :param end: int number of operations of the original expressions covered by the value
+        """
+        self.index = index
+        self.parent = parent
+        self.expression = expression
+        self.end = end
+
+    def get(self, data, scratch):
+        value = scratch[self.index]
+        if value is UNSET:
+            if self.parent is None:
+                value = self.expression.evaluate(data)
+            else:
+                value = self.expression.evaluateFrom(self.parent.get(data, scratch), data)
+            scratch[self.index] = value
+        return value
+
+    async def getAsync(self, data, scratch):
+        # The slot holds a task, so expressions evaluated concurrently wait for the same computation
+        import asyncio
+        task = scratch[self.index]
+        if task is UNSET:
+            task = scratch[self.index] = asyncio.ensure_future(self._computeAsync(data, scratch))
+        return await task
+
+    async def _computeAsync(self, data, scratch):
+        if self.parent is None:
+            return await self.expression.evaluateAsync(data)
+        return await self.expression.evaluateFromAsync(await self.parent.getAsync(data, scratch), data)
+
+
+class SharedExpressionNode(object):
+    """
+    An expression of a template that starts from a SharedValue. Its result may be (or contain) the shared value, so a
+    mutable result is copied: the keys of the output and the inputs of tuple functions never alias each other.
+    """
+    __slots__ = ('shared', 'rest', 'location')
+
+    def __init__(self, shared, rest, location):
+        """
+        :param shared: SharedValue
+        :param rest: Interpreter.CompiledExpression operations applied after the shared value, or None
+        :param location: str output key (used for error reporting)
+        """
+        self.shared = shared
+        self.rest = rest
+        self.location = location
+
+    def evaluate(self, data, scratch):
+        value = self.shared.get(data, scratch)
+        if self.rest is not None:
+            value = self.rest.evaluateFrom(value, data)
+        return _unshared(value)
+
+    async def evaluateAsync(self, data, scratch, limiter):
+        value = await self.shared.getAsync(data, scratch)
+        if self.rest is not None:
+            value = await self.rest.evaluateFromAsync(value, data)
+        return _unshared(value)
+
+
+def _unshared(value):
+    """
+    Returns a value computed from a shared value, copied if it is mutable.
+
+    :param value: result of a SharedExpressionNode
+    :return: value
+    """
+    return copy.deepcopy(value) if isinstance(value, (dict, list, set)) else value
+
+
+def isPureOperation(operation):
+    """
+    Returns True if the result of an operation only depends on its input and arguments.
+
+    :param operation: str name of the operation
+    :return: bool
+    """
+    # Operations missing from the registry compiled to an index or a selector
+    return operation not in Functions.functions or Functions.isPure(operation)
+
+
+def _operationKey(operation):
+    """
+    Returns a key identifying an operation with its arguments, or None if it cannot be shared.
+
+    :param operation: compiled operation of an Interpreter.CompiledExpression
+    :return: tuple | None
+    """
+    name, function, arguments, constants = operation
+    if not isPureOperation(name):
+        return None
+    key = [name]
+    for argument in arguments:
+        if isinstance(argument, Parser.Constant):
+            # The type keeps 1, 1.0 and true apart
+            key.append(('constant', type(argument.value), argument.value))
+        else:
+            key.append(('path', argument.keys))
+    key = tuple(key)
+    try:
+        hash(key)
+    except TypeError:
+        return None
+    return key
+
+
+def _prefixKeys(expression):
+    """
+    Returns the keys of the shareable prefixes of an expression: the selector with its first 1, 2, ... operations.
+
+    :param expression: Interpreter.CompiledExpression
+    :return: [tuple]
+    """
+    if isinstance(expression.selector, FoldedValue):
+        return []
+    key = (None if expression.selector is None else expression.selector.keys,)
+    keys = []
+    for operation in expression.operations:
+        operationKey = _operationKey(operation)
+        if operationKey is None:
+            break
+        key = key + (operationKey,)
+        keys.append(key)
+    return keys
+
+
+def _expressionNodes(node, found):
+    """
+    Collects the ExpressionNodes of a template.
+
+    :param node: evaluation node
+    :param found: [Interpreter.ExpressionNode] filled in
+    :return: found
+    """
+    if isinstance(node, (Interpreter.DictNode, Interpreter.ListNode)):
+        for child in node.children:
+            _expressionNodes(child, found)
+    elif isinstance(node, Interpreter.FunctionNode):
+        _expressionNodes(node.source, found)
+    elif isinstance(node, Interpreter.ExpressionNode):
+        found.append(node)
+    return found
+
+
+def _replace(node, replacements):
+    """
+    Rebuilds a template with some of its ExpressionNodes replaced.
+
+    :param node: evaluation node
+    :param replacements: {id(ExpressionNode): node}
+    :return: evaluation node
+    """
+    if isinstance(node, Interpreter.DictNode):
+        return Interpreter.DictNode(node.keys, tuple(_replace(child, replacements) for child in node.children))
+    elif isinstance(node, Interpreter.ListNode):
+        return Interpreter.ListNode(tuple(_replace(child, replacements) for child in node.children))
+    elif isinstance(node, Interpreter.FunctionNode):
+        return Interpreter.FunctionNode(_replace(node.source, replacements), node.location, node.function, node.params)
+    return replacements.get(id(node), node)
+
+
+def eliminateCommonSubexpressions(compiled):
+    """
+    Finds selector and operation prefixes shared by several expressions of a template, so each one is computed once
+    per record and its result reused. Only pure operations are shared.
+
+    :param compiled: Interpreter.CompiledTransform
+    :return: Interpreter.CompiledTransform
+    """
+    nodes = _expressionNodes(compiled.root, [])
+    chains = [_prefixKeys(node.expression) for node in nodes]
+
+    counts = {}
+    for chain in chains:
+        for key in chain:
+            counts[key] = counts.get(key, 0) + 1
+
+    # A prefix is worth a slot if several expressions use it, and they do not all continue with the same operation
+    largestExtension = {}
+    for chain in chains:
+        for key, extension in zip(chain, chain[1:]):
+            largestExtension[key] = max(largestExtension.get(key, 0), counts[extension])
+    kept = set(key for key, count in counts.items() if count >= 2 and largestExtension.get(key, 0) < count)
+    if not kept:
+        return compiled
+
+    shared = {}
+    replacements = {}
+    for node, chain in zip(nodes, chains):
+        expression = node.expression
+        parent = None
+        for length, key in enumerate(chain, 1):
+            if key not in kept:
+                continue
+            if key not in shared:
+                start = 0 if parent is None else parent.end
+                selector = expression.selector if parent is None else None
+                prefix = Interpreter.CompiledExpression(None, selector, expression.operations[start:length])
+                shared[key] = SharedValue(compiled.slots + len(shared), parent, prefix, length)
+            parent = shared[key]
+
+        if parent is not None:
+            rest = expression.operations[parent.end:]
+            rest = Interpreter.CompiledExpression(expression.source, None, rest) if rest else None
+            replacements[id(node)] = SharedExpressionNode(parent, rest, node.location)
+
+    root = _replace(compiled.root, replacements)
+    return Interpreter.CompiledTransform(compiled.template, root, compiled.slots + len(shared))
+
+
+def _expressionPaths(expression, paths, chained=False):
+    """
+    Adds the paths of the record read by an expression.
+
+    :param expression: Interpreter.CompiledExpression
+    :param paths: set of tuples of keys, filled in
+    :param chained: bool the expression continues from a shared value instead of its selector
+    """
+    operations = expression.operations
+    selector = expression.selector
+    if chained or isinstance(selector, FoldedValue):
+        pass
+    elif selector is not None:
+        paths.add(selector.keys)
+    elif not operations or operations[0][0] not in Functions.inputlessFunctions:
+        # The whole record, unless the first operation ignores it
+        paths.add(())
+    for name, function, arguments, constants in operations:
+        for argument in arguments:
+            if isinstance(argument, Parser.PathArgument):
+                paths.add(argument.keys)
+
+
+def requiredPaths(node, paths=None):
+    """
+    Finds the paths of the record read by a compiled template.
+
+    :param node: evaluation node (the root of an Interpreter.CompiledTransform)
+    :param paths: set of tuples of keys, filled in
+    :return: set of tuples of keys; an empty tuple means the whole record
+    """
+    if paths is None:
+        paths = set()
+    if isinstance(node, (Interpreter.DictNode, Interpreter.ListNode)):
+        for child in node.children:
+            requiredPaths(child, paths)
+    elif isinstance(node, Interpreter.FunctionNode):
+        requiredPaths(node.source, paths)
+    elif isinstance(node, Interpreter.ExpressionNode):
+        _expressionPaths(node.expression, paths)
+    elif isinstance(node, SharedExpressionNode):
+        shared = node.shared
+        while shared is not None:
+            _expressionPaths(shared.expression, paths, shared.parent is not None)
+            shared = shared.parent
+        if node.rest is not None:
+            _expressionPaths(node.rest, paths, True)
+    return paths
+
+
+def optimize(compiled):
+    """
+    Runs every optimization on a compiled template.
+
+    :param compiled: Interpreter.CompiledTransform
+    :return: Interpreter.CompiledTransform
+    """
+    return eliminateCommonSubexpressions(compiled)
@@ -0,0 +1,342 @@
+# -*- coding:utf-8 -*-
+
+# Copyright (c) 2015-2021 Agalmic Ventures LLC (www.agalmicventures.com)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+"""
+Runs compiled templates over large batches of records on a pool of worker processes.
+"""
+
+import collections
+import concurrent.futures
+import importlib
+import io
+import itertools
+import multiprocessing
+import queue
+import sys
+import threading
+import traceback
+from JTL import Functions
+from JTL import Interpreter
+from JTL import json_codec
+from JTL import json_util
+
+DEFAULT_CHUNKSIZE = 256
+
+# Number of lines of JSON Lines input sent to a worker at once
+DEFAULT_LINE_BATCH = 1000
+
+# Seconds transformLines waits for a result before checking that its workers are still alive
+WORKER_CHECK_INTERVAL = 1.0
+
+# Template compiled once per worker process by _initializeWorker
+_workerTransform = None
+
+
+def _registrationsPayload():
+    """
+    Lists what a worker process needs to register the same custom functions as this one.
+
+    Functions registered by a decorator are replaced by a wrapper in their module, so they cannot be pickled by
+    reference: importing their module in the worker registers them again.
+
+    :return: (list of module names, dict like Functions.registrations)
+    """
+    modules = []
+    registrations = {}
+    for operation, registration in Functions.registrations.items():
+        if operation not in Functions.functions:
+            # Removed from the registry since
+            continue
+        function = registration[0]
+        moduleName = getattr(function, '__module__', None)
+        module = sys.modules.get(moduleName)
+        if module is not None and moduleName != '__main__' and moduleName not in modules:
+            modules.append(moduleName)
+        attribute = module
+        for name in getattr(function, '__qualname__', '<locals>').split('.'):
+            attribute = getattr(attribute, name, None)
+        if attribute is not function and attribute is not None and moduleName != '__main__':
+            continue
+        registrations[operation] = registration
+    return modules, registrations
+
+
+def _initializeWorker(template, modules, registrations, sharedEnums=()):
+    """
+    Prepares a worker process: registers the custom functions of the parent process, then compiles the template.
+
+    :param template: dict | list | str | tuple
+    :param modules: list of names of the modules registering functions when imported
+    :param registrations: dict like Functions.registrations
+    :param sharedEnums: names of the enum files the parent process preloaded in shared memory
+    """
+    global _workerTransform
+    for module in modules:
+        importlib.import_module(module)
+    Functions.registerAll(registrations)
+    # Mapped (not parsed again) when first used
+    json_util.BIG_ENUM_JSON.shared.update(sharedEnums)
+    _workerTransform = Interpreter.compileTemplate(template)
+
+
+def _transformChunk(chunk):
+    """
+    Transforms a chunk of records in a worker process.
+
+    :param chunk: list of dict
+    :return: list of transformed records
+    """
+    return list(_workerTransform.apply_many(chunk))
+
+
+def _chunks(records, size):
+    records = iter(records)
+    while True:
+        chunk = list(itertools.islice(records, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def transformChunks(records, transformData, workers, chunksize=DEFAULT_CHUNKSIZE, ordered=True, context=None):
+    """
+    Transforms every record of an iterable on worker processes, yielding the results by chunks.
+
+    The template is sent to each worker once, when it starts, with the functions registered through
+    Functions.register. With the "spawn" and "forkserver" start methods they have to be picklable
+    (defined at module level); with "fork" anything works.
+
+    :param records: iterable of dict
+    :param transformData: dict | list | str | tuple, or a CompiledTransform
+    :param workers: int number of worker processes
+    :param chunksize: int number of records sent to a worker at once
+    :param ordered: bool yield the chunks in the order of the records, otherwise as soon as they are done
+    :param context: multiprocessing context, None for the default one
+    :return: generator of lists of transformed records
+    """
+    if workers < 1:
+        raise ValueError('workers must be positive, got %s' % workers)
+    if chunksize < 1:
+        raise ValueError('chunk size must be positive, got %s' % chunksize)
+    if isinstance(transformData, Interpreter.CompiledTransform):
+        transformData = transformData.template
+    # Fail in this process rather than in every worker
+    Interpreter.compileTemplate(transformData)
+
+    executor = concurrent.futures.ProcessPoolExecutor(
+        max_workers=workers, mp_context=context, initializer=_initializeWorker,
+        initargs=(transformData,) + _registrationsPayload() + (sorted(json_util.BIG_ENUM_JSON.shared),))
+    # Bounded number of chunks in flight, so the records are read as fast as they are transformed
+    limit = 2 * workers
+    pending = collections.deque()
+    try:
+        for chunk in _chunks(records, chunksize):
+            if len(pending) >= limit:
+                if ordered:
+                    yield pending.popleft().result()
+                else:
+                    done, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                    for future in done:
+                        pending.remove(future)
+                        yield future.result()
+            pending.append(executor.submit(_transformChunk, chunk))
+
+        if ordered:
+            while pending:
+                yield pending.popleft().result()
+        else:
+            for future in concurrent.futures.as_completed(pending):
+                yield future.result()
+            pending.clear()
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+def transformMany(records, transformData, workers, chunksize=DEFAULT_CHUNKSIZE, ordered=True, context=None):
+    """
+    Transforms every record of an iterable on worker processes, lazily.
+
+    :param records: iterable of dict
+    :param transformData: dict | list | str | tuple, or a CompiledTransform
+    :param workers: int number of worker processes
+    :param chunksize: int number of records sent to a worker at once
+    :param ordered: bool yield the results in the order of the records
+    :param context: multiprocessing context, None for the default one
+    :return: generator of transformed records
+    """
+    for chunk in transformChunks(records, transformData, workers, chunksize, ordered, context):
+        yield from chunk
+
+
+# ######### JSON Lines Pipeline ##########
+
+
+def _lineWorker(inputs, outputs, template, modules, registrations, sharedEnums, project, backend):
+    """
+    Worker process of transformLines: transforms batches of lines until it receives None.
+
+    :param inputs: multiprocessing queue of (sequence number, number of the first line, list of bytes lines) | None
+    :param outputs: multiprocessing queue of (sequence number, str results, str error) | None when done
+    :param template: dict | list | str | tuple
+    :param modules: list of names of the modules registering functions when imported
+    :param registrations: dict like Functions.registrations
+    :param sharedEnums: names of the enum files the parent process preloaded in shared memory
+    :param project: bool only keep the input fields read by the template once decoded
+    :param backend: str name of the json backend of the parent process
+    """
+    import JTL
+    try:
+        json_codec.set_backend(backend)
+        _initializeWorker(template, modules, registrations, sharedEnums)
+        while True:
+            batch = inputs.get()
+            if batch is None:
+                break
+            sequence, start, lines = batch
+            output = io.StringIO()
+            try:
+                JTL.runLines(lines, _workerTransform, output, start, project)
+            except Exception:
+                outputs.put((sequence, None, traceback.format_exc()))
+                break
+            outputs.put((sequence, output.getvalue(), None))
+    except Exception:
+        outputs.put((-1, None, traceback.format_exc()))
+    finally:
+        outputs.put(None)
+
+
+def _readLines(lines, inputs, workers, batchsize, budget, stop, errors):
+    """
+    Reader thread of transformLines: cuts the input into numbered batches of lines.
+
+    :param lines: iterable of bytes lines
+    :param inputs: multiprocessing queue of batches
+    :param workers: int number of worker processes, each one gets a final None
+    :param batchsize: int number of lines per batch
+    :param budget: threading.Semaphore limiting the batches not written yet
+    :param stop: threading.Event set when the writer gave up
+    :param errors: list the exception reading the input is appended to
+    """
+    try:
+        for sequence, batch in enumerate(_chunks(lines, batchsize)):
+            budget.acquire()
+            if stop.is_set():
+                break
+            inputs.put((sequence, sequence * batchsize + 1, batch))
+    except Exception as e:
+        errors.append(e)
+    finally:
+        for _ in range(workers):
+            inputs.put(None)
+
+
+def transformLines(lines, transformData, workers, output, batchsize=DEFAULT_LINE_BATCH, project=False, context=None):
+    """
+    Transforms newline delimited JSON records (JSON Lines) on worker processes, writing one compact result per line
+    in the order of the input.
+
+    A reader thread cuts the input into batches for the workers, which each hold the compiled template, and the results
+    are written back in order by this thread. At most 2 batches per worker are read and not written yet, so memory stays
+    bounded whatever the size of the input.
+
+    :param lines: iterable of bytes lines (a binary file or stdin)
+    :param transformData: dict | list | str | tuple, or a CompiledTransform
+    :param workers: int number of worker processes
+    :param output: text file the results are written to
+    :param batchsize: int number of lines sent to a worker at once
+    :param project: bool only keep the input fields read by the template once decoded
+    :param context: multiprocessing context, None for the default one
+    """
+    if workers < 1:
+        raise ValueError('workers must be positive, got %s' % workers)
+    if batchsize < 1:
+        raise ValueError('batch size must be positive, got %s' % batchsize)
+    if isinstance(transformData, Interpreter.CompiledTransform):
+        transformData = transformData.template
+    # Fail in this process rather than in every worker
+    Interpreter.compileTemplate(transformData)
+
+    context = context or multiprocessing.get_context()
+    limit = 2 * workers
+    inputs = context.Queue(limit)
+    outputs = context.Queue()
+    modules, registrations = _registrationsPayload()
+    processes = [context.Process(target=_lineWorker, daemon=True,
+                                 args=(inputs, outputs, transformData, modules, registrations,
+                                       sorted(json_util.BIG_ENUM_JSON.shared), project, json_codec.get_codec().name))
+                 for _ in range(workers)]
+    for process in processes:
+        process.start()
+
+    budget = threading.Semaphore(limit)
+    stop = threading.Event()
+    errors = []
+    reader = threading.Thread(target=_readLines, args=(lines, inputs, workers, batchsize, budget, stop, errors),
+                              daemon=True)
+    reader.start()
+
+    # Write the batches in order, keeping the ones done early until their turn
+    done = {}
+    expected = 0
+    running = workers
+    try:
+        while running:
+            try:
+                message = outputs.get(timeout=WORKER_CHECK_INTERVAL)
+            except queue.Empty:
+                # A worker killed (out of memory, os._exit, crash of an extension) never sends its final None
+                exited = [process.exitcode for process in processes if process.exitcode is not None]
+                if len(exited) <= workers - running:
+                    continue
+                # A worker writes its last messages before exiting: read them before giving up
+                try:
+                    message = outputs.get(timeout=WORKER_CHECK_INTERVAL)
+                except queue.Empty:
+                    raise RuntimeError('worker process exited without finishing (exit codes %s)' %
+                                       ', '.join(str(code) for code in exited))
+            if message is None:
+                running -= 1
+                continue
+            sequence, text, error = message
+            if error is not None:
+                raise RuntimeError('worker failed on batch %s:\n%s' % (sequence, error))
+            done[sequence] = text
+            while expected in done:
+                output.write(done.pop(expected))
+                expected += 1
+                budget.release()
+        if errors:
+            raise errors[0]
+    finally:
+        stop.set()
+        # Unblock the reader if it waits for the budget
+        budget.release()
+        if running:
+            # Given up early: nobody reads the queues anymore
+            inputs.cancel_join_thread()
+            outputs.cancel_join_thread()
+        for process in processes:
+            if running:
+                process.terminate()
+            process.join()
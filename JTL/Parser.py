@@ -20,12 +20,75 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 
-import shlex
+import re
 
 from JTL import Utility
 from JTL import json_util
 
 
+# Tokens are split the same way as shlex.shlex(transform, posix=False) with '.+-*=<>!' added to its word characters
+_WORD_CHARS = r'A-Za-z0-9_.+\-*=<>!'
+_TOKEN_RE = re.compile(r'''"[^"]*"|'[^']*'|[{w}][{w}"']*|[^ \t\r\n]'''.format(w=_WORD_CHARS))
+_START_RE = re.compile(
+    r'''(?P<space>[ \t\r\n]+)|(?P<comment>#[^\n]*\n?)|(?P<quoted>"[^"]*"|'[^']*')|(?P<quote>["'])'''
+    r'''|(?P<word>[{w}][{w}"']*)|(?P<other>.)'''.format(w=_WORD_CHARS), re.S)
+_WORD_RE = re.compile(r'''[{w}"']+|#[^\n]*\n?'''.format(w=_WORD_CHARS))
+
+
+def tokenize(transform):
+    """
+    Splits a single JTL transform into tokens.
+
+    Words run over letters, digits and '_.+-*=<>!' (quotes inside a word are kept as they are), quoted strings
+    keep their quotes, '#' starts a comment, and any other character is a token of its own.
+
+    :param transform: str
+    :return: [str]
+    """
+    if '#' in transform:
+        return _tokenizeComments(transform)
+
+    tokens = _TOKEN_RE.findall(transform)
+    # A lone quote only matches when its string is never closed
+    if '"' in tokens or "'" in tokens:
+        raise ValueError('No closing quotation')
+    return tokens
+
+
+def _tokenizeComments(transform):
+    """
+    Slower tokenize for transforms containing comments: a comment inside a word is dropped and the word carries on
+    after it, which a single regex cannot express.
+
+    :param transform: str
+    :return: [str]
+    """
+    tokens = []
+    pos, end = 0, len(transform)
+    while pos < end:
+        match = _START_RE.match(transform, pos)
+        pos = match.end()
+        kind = match.lastgroup
+        if kind == 'space' or kind == 'comment':
+            continue
+        if kind == 'quote':
+            raise ValueError('No closing quotation')
+        if kind != 'word':
+            tokens.append(match.group())
+            continue
+
+        word = [match.group()]
+        while pos < end:
+            match = _WORD_RE.match(transform, pos)
+            if match is None:
+                break
+            pos = match.end()
+            if match.group()[0] != '#':
+                word.append(match.group())
+        tokens.append(''.join(word))
+    return tokens
+
+
 def parseTransform(transform):
     """
     Parses a single JTL transform into tokens.
@@ -33,14 +96,10 @@ def parseTransform(transform):
     :param transform: str
     :return: [[str]]
     """
-    # Create a lexer with some slight tweaks
-    lexer = shlex.shlex(transform, posix=False)
-    lexer.wordchars += '.+-*=<>!'
-
     # Split into operations
     operations = []
     operation = []
-    for token in lexer:
+    for token in tokenize(transform):
         # Split tokens on $
         if token == '$':
             operations.append(operation)
@@ -54,25 +113,56 @@ def parseTransform(transform):
     return operations
 
 
-def parseArgument(argument, data):
+class Constant(object):
     """
-    Parses an argument to an operation.
+    An argument whose value is known when the expression is compiled.
+    """
+    __slots__ = ('value',)
+
+    def __init__(self, value):
+        self.value = value
+
+    def resolve(self, data):
+        return self.value
+
+
+class PathArgument(Utility.CompiledPath):
+    """
+    An argument naming a field of the original data.
+    """
+    __slots__ = ()
+
+    resolve = Utility.CompiledPath.get
+
+
+def compileArgument(argument):
+    """
+    Classifies an argument to an operation once, as either a constant or a path into the data.
 
     :param argument: str from tokenization
-    :param data: dict of original data to extract more fields from
-    :return: a valid JSON value
+    :return: Constant | PathArgument
     """
     if argument is None:
-        return None
+        return Constant(None)
 
     if argument == '':
-        return ''
+        return Constant('')
 
     # Try loading as a constrant first
     # TODO: strings are awkward and require escaping, so figure that out
     value = json_util.load_json(argument)
     if value is not None:
-        return value
+        return Constant(value)
     # If that fails, it might be a name
-    return Utility.extractPath(data, argument)
+    return PathArgument(argument)
+
+
+def parseArgument(argument, data):
+    """
+    Parses an argument to an operation.
 
+    :param argument: str from tokenization
+    :param data: dict of original data to extract more fields from
+    :return: a valid JSON value
+    """
+    return compileArgument(argument).resolve(data)
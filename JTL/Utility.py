@@ -20,6 +20,149 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 
+import collections
+import threading
+
+_MISSING = object()
+
+
+class LRUCache(object):
+    """
+    A bounded mapping that discards the least recently used entry once it is full.
+
+    Hits, misses and evictions are counted so callers can report how well the cache is working.
+    """
+
+    def __init__(self, maxsize=1024):
+        """
+        :param maxsize: int maximum number of entries kept
+        """
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def get(self, key, default=None):
+        """
+        Looks up a key, marking it as the most recently used.
+
+        :param key: hashable
+        :param default: returned when the key is not cached
+        :return: the cached value or default
+        """
+        # Lookups do not take the lock: the counters may drift under threads, but the data stays consistent
+        value = self._data.get(key, _MISSING)
+        if value is _MISSING:
+            self.misses += 1
+            return default
+        try:
+            self._data.move_to_end(key)
+        except KeyError:
+            # evicted by another thread in the meantime
+            pass
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        """
+        Stores a value, evicting the least recently used entries if the cache is full.
+
+        :param key: hashable
+        :param value: any value
+        """
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """
+        Drops every entry and resets the counters.
+        """
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def info(self):
+        """
+        Returns the cache counters.
+
+        :return: dict
+        """
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'size': len(self._data),
+            'maxsize': self.maxsize,
+        }
+
+
+class CompiledPath(object):
+    """
+    A period separated path split once, to index many JSON objects.
+    """
+    __slots__ = ('path', 'keys')
+
+    def __init__(self, path):
+        """
+        :param path: str
+        """
+        self.path = path
+        if not path or path == '.':
+            self.keys = ()
+        else:
+            if path[0] == '.':
+                path = path[1:]
+            self.keys = tuple(path.split('.'))
+
+    def get(self, data):
+        """
+        Indexes a JSON object with the path.
+
+        :param data: dict
+        :return: a valid JSON value, or None when a level is missing or is not a dict
+        """
+        try:
+            for key in self.keys:
+                data = data.get(key)
+        except AttributeError:
+            return None
+        return data
+
+
+# Compiled paths keyed by path string; simply emptied when full, since a lookup must stay cheaper than a split
+PATH_CACHE_SIZE = 4096
+_pathCache = {}
+
+
+def compilePath(path):
+    """
+    Returns the CompiledPath for a period separated path, reusing a cached one when possible.
+
+    :param path: str
+    :return: CompiledPath
+    """
+    compiled = _pathCache.get(path)
+    if compiled is None:
+        compiled = CompiledPath(path)
+        if len(_pathCache) >= PATH_CACHE_SIZE:
+            _pathCache.clear()
+        _pathCache[path] = compiled
+    return compiled
+
 
 def extractPath(data, path):
     """
@@ -29,14 +172,7 @@ def extractPath(data, path):
     :param path: str
     :return: a valid JSON value
     """
-    if not path:
-        return data
-    if path == '.':
-        return data
-    elif path[0] == '.':
-        path = path[1:]
-    splitPath = path.split('.')
-    return extractSplitPath(data, splitPath)
+    return compilePath(path).get(data)
 
 
 def extractSplitPath(data, splitPath):
@@ -47,9 +183,9 @@ def extractSplitPath(data, splitPath):
     :param path: [str]
     :return: a valid JSON value
     """
-    if data is None:
-        return None
-    if not hasattr(data, 'get'):
+    try:
+        for key in splitPath:
+            data = data.get(key)
+    except AttributeError:
         return None
-    nextData = data.get(splitPath[0])
-    return nextData if len(splitPath) <= 1 or nextData is None else extractSplitPath(nextData, splitPath[1:])
+    return data
@@ -23,11 +23,102 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 
-import argparse
-import json
+import io
+import os
 import sys
 
 
+def compile(transformData):
+    """
+    Compiles a JTL template once, so it can be applied to many records.
+
+    :param transformData: dict | list | str | tuple
+    :return: JTL.Interpreter.CompiledTransform
+    """
+    from JTL import Interpreter
+    return Interpreter.compileTemplate(transformData)
+
+
+def runLines(lines, compiled, output, start=1, project=False):
+    """
+    Transforms newline delimited JSON records (JSON Lines) one by one, writing one compact result per line.
+
+    :param lines: iterable of bytes lines (a binary file or stdin)
+    :param compiled: JTL.Interpreter.CompiledTransform
+    :param output: text file the results are written to
+    :param start: int number of the first line, for error reporting
+    :param project: bool only keep the input fields read by the transformation once decoded
+    :raise ValueError: for a line which is not valid JSON, with its line number
+    """
+    from JTL import json_codec, json_util
+    projection = compiled.input_projection() if project else None
+    codec = json_codec.get_codec()
+    dumps = codec.dumps
+    loads = codec.loads
+    write = output.write
+    for number, line in enumerate(lines, start):
+        if not line.strip():
+            continue
+        # Strict decoding: a malformed record must not become a result full of nulls
+        try:
+            data = loads(line)
+        except ValueError as e:
+            raise ValueError('invalid JSON record on line %d: %s' % (number, e)) from None
+        if projection is not None:
+            data = json_util.project_json(data, projection)
+        result = compiled.apply(data)
+        write(dumps(result, None, True))
+        write('\n')
+
+
+def runArray(elements, compiled, output):
+    """
+    Transforms the elements of a JSON array one by one, writing the results as a JSON array with one result per line.
+
+    :param elements: iterable of records (e.g. json_util.iter_json_array)
+    :param compiled: JTL.Interpreter.CompiledTransform
+    :param output: text file the results are written to
+    """
+    from JTL import json_codec
+    dumps = json_codec.get_codec().dumps
+    write = output.write
+    separator = '[\n'
+    for result in compiled.apply_many(elements):
+        write(separator)
+        write(dumps(result, None, True))
+        separator = ',\n'
+    write('[]\n' if separator == '[\n' else '\n]\n')
+
+
+def runStream(source_file, result_file, run, check):
+    """
+    Runs a streaming mode of the CLI, from a file or stdin to stdout.
+
+    :param source_file: str name of the input file, None for stdin
+    :param result_file: str name of the expected result file, None to write the results to stdout
+    :param run: f(binary input file, text output file)
+    :param check: f(str output) -> bool compares the output with the result file
+    :return: int exit code
+    """
+    source = open(source_file, 'rb') if source_file else sys.stdin.buffer
+    try:
+        if result_file:
+            output = io.StringIO()
+            run(source, output)
+            assert check(output.getvalue())
+        else:
+            run(source, sys.stdout)
+            sys.stdout.flush()
+    except BrokenPipeError:
+        # The reader went away (e.g. piped to head): stop quietly
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return 1
+    finally:
+        if source is not sys.stdin.buffer:
+            source.close()
+    return 0
+
+
 def main():
     """
     Runs the main JTL program.
@@ -36,16 +127,27 @@ def main():
     """
 
     # Parse arguments
+    import argparse
     parser = argparse.ArgumentParser(description='JSON Transformation Language')
     parser.add_argument('-i', '--indent', default=4, type=int, help='Indentation amount.')
     parser.add_argument('-t', '--transform-file', help='The name of the JSON file containing the transformation to run.')
     parser.add_argument('-s', '--source-file', help='The name of the JSON file containing the source data to run.')
     parser.add_argument('-r', '--result-file', help='The name of the JSON file containing the result data of run.')
+    parser.add_argument('-p', '--project', action='store_true',
+                        help='Only keep the input fields read by the transformation once decoded '
+                             '(the input is still decoded whole).')
+    parser.add_argument('-n', '--ndjson', action='store_true',
+                        help='Read one JSON record per line and write one compact result per line.')
+    parser.add_argument('-a', '--stream-array', action='store_true',
+                        help='Read the input as a JSON array one element at a time, and write the results as an array.')
+    parser.add_argument('-j', '--jobs', default=1, type=int,
+                        help='With --ndjson, the number of worker processes transforming the records.')
+    parser.add_argument('--batch-size', default=1000, type=int,
+                        help='With --jobs, the number of lines sent to a worker process at once.')
     parser.add_argument('transform', nargs='?', help='The transformation to run.')
     arguments = parser.parse_args(sys.argv[1:])
 
-    sys.path.append('.')
-    import Interpreter, json_util
+    from JTL import Interpreter, json_codec, json_util
 
     # Load the transformation
     if arguments.transform is None and arguments.transform_file is not None:
@@ -58,26 +160,73 @@ def main():
         print('ERROR: Specify either a transform file or a transform')
         return 1
 
-    # Read the JSON in from stdin
-    data = None
-    if arguments.source_file:
-        data = json_util.load_json_file(arguments.source_file)
-    if not data:
-        data = json_util.load_json(sys.stdin.read())
+    if arguments.jobs > 1 and not arguments.ndjson:
+        print('ERROR: --jobs needs --ndjson')
+        return 1
+
+    if arguments.stream_array:
+        compiled = Interpreter.compileTemplate(transform_data)
+
+        def run(source, output):
+            runArray(json_util.iter_json_array(source), compiled, output)
+
+        def check(text):
+            return json_codec.loads(text) == json_util.load_json_file(arguments.result_file)
+
+        return runStream(arguments.source_file, arguments.result_file, run, check)
+
+    if arguments.ndjson:
+        if arguments.jobs > 1:
+            from JTL import Parallel
+
+            def run(source, output):
+                Parallel.transformLines(source, transform_data, arguments.jobs, output, arguments.batch_size,
+                                        arguments.project)
+        else:
+            compiled = Interpreter.compileTemplate(transform_data)
+
+            def run(source, output):
+                runLines(source, compiled, output, project=arguments.project)
+
+        def check(text):
+            with open(arguments.result_file, 'rb') as f:
+                expected = [json_util.load_json(line) for line in f if line.strip()]
+            return [json_util.load_json(line) for line in text.splitlines()] == expected
+
+        return runStream(arguments.source_file, arguments.result_file, run, check)
+
+    if arguments.project:
+        # Read the raw JSON, the transformation decides which fields are kept
+        if arguments.source_file:
+            with open(arguments.source_file, 'rb') as f:
+                raw = f.read()
+        else:
+            raw = sys.stdin.buffer.read()
+        result = Interpreter.transformJsonBytes(raw, transform_data)
+    else:
+        # Read the JSON in from stdin
+        data = None
+        if arguments.source_file:
+            data = json_util.load_json_file(arguments.source_file)
+        if not data:
+            data = json_util.load_json(sys.stdin.read())
 
-    # Transform the JSON
-    # TODO: cleaner way to do this
-    result = Interpreter.transformJson(data, transform_data)
+        # Transform the JSON
+        # TODO: cleaner way to do this
+        result = Interpreter.transformJson(data, transform_data)
 
     # Output the result
     if arguments.result_file:
         file_result = json_util.load_json_file(arguments.result_file)
         assert result == file_result
     else:
-        print(json.dumps(result, indent=arguments.indent, sort_keys=True))
+        print(json_codec.dumps(result, indent=arguments.indent, sort_keys=True))
 
     return 0
 
 
 if __name__ == '__main__':
-    sys.exit(main())
+    # Run as a script (./JTL/__init__.py): make the JTL package importable, as python3 -m JTL does
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from JTL import main as packageMain
+    sys.exit(packageMain())
@@ -0,0 +1,11 @@
+# -*- coding:utf-8 -*-
+"""
+Command line entry point: python3 -m JTL '<transformation>' < input.json
+"""
+
+import sys
+
+from JTL import main
+
+if __name__ == '__main__':
+    sys.exit(main())
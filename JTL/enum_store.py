@@ -0,0 +1,448 @@
+# -*- coding:utf-8 -*-
+"""
+enum store: enum tables in a SQLite file, for the enums too big to be loaded in memory
+
+enumFileChange reads the files ending by one of STORE_EXTENSIONS with an EnumStore: a lookup is a query on the
+indexed file, behind a small LRU of the hot keys, so the memory used does not depend on the size of the enum.
+build_enum_store writes such a file from a dict or (key, value) pairs.
+
+The enum files preloaded by json_util.BIG_ENUM_JSON.preload are converted once to a compact file mapped in memory,
+read with a MappedEnum: the worker processes share its pages instead of parsing the enum into their own copy.
+"""
+import os
+import abc
+import json
+import struct
+import threading
+
+from JTL.Utility import LRUCache
+
+# files read by enumFileChange as an EnumStore
+STORE_EXTENSIONS = ('.sqlite', '.sqlite3', '.db')
+# results of the most recent lookups kept in memory, per store
+STORE_HOT_SIZE = 4096
+# rows written per transaction by build_enum_store
+BUILD_BATCH_SIZE = 10000
+
+_MISSING = object()
+_ENCODE = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'), sort_keys=True).encode
+_DECODE = json.JSONDecoder().decode
+# a key not in the store, in the hot entries
+_NOT_FOUND = object()
+
+
+def is_store_file(file_name):
+    """
+    check if enumFileChange reads a file as an EnumStore, by its extension
+    :param file_name: file path
+    :return: bool
+    """
+    return os.path.splitext(file_name)[1].lower() in STORE_EXTENSIONS
+
+
+def _encode(value):
+    """
+    the text of a key or value in the store: its json, so 1 and '1' stay different like in a dict
+    :param value: json value
+    :return: str
+    """
+    return _ENCODE(value)
+
+
+def build_enum_store(enum_dict, file_path):
+    """
+    write an enum to a store file, replaced at once so the readers see either the old or the new enum
+    :param enum_dict: dict | iterable of (key, value) pairs, keys are str or int
+    :param file_path: file path, ending by one of STORE_EXTENSIONS to be read by enumFileChange
+    :return: int number of entries written
+    """
+    import sqlite3
+    items = enum_dict.items() if isinstance(enum_dict, dict) else enum_dict
+    temp_path = '%s.%d.tmp' % (file_path, os.getpid())
+    if os.path.exists(temp_path):
+        os.remove(temp_path)
+    count = 0
+    connection = sqlite3.connect(temp_path)
+    try:
+        connection.execute('PRAGMA journal_mode=OFF')
+        connection.execute('PRAGMA synchronous=OFF')
+        connection.execute('CREATE TABLE enum (key TEXT PRIMARY KEY, value TEXT) WITHOUT ROWID')
+        batch = []
+        for key, value in items:
+            batch.append((_encode(key), _encode(value)))
+            if len(batch) >= BUILD_BATCH_SIZE:
+                connection.executemany('INSERT OR REPLACE INTO enum VALUES (?, ?)', batch)
+                count += len(batch)
+                batch = []
+        connection.executemany('INSERT OR REPLACE INTO enum VALUES (?, ?)', batch)
+        count += len(batch)
+        # 反查: 值本身也是合法的输入
+        connection.execute('CREATE INDEX enum_value ON enum (value)')
+        connection.commit()
+    except BaseException:
+        connection.close()
+        os.remove(temp_path)
+        raise
+    connection.close()
+    os.replace(temp_path, file_path)
+    return count
+
+
+class DiskEnum(abc.ABC):
+    """
+    an enum read from a file on demand, with the lookups of EnumTable: a str of digits also finds its int key, an int
+    or other key also finds its str key, and a value is found among the values.
+    Keys and values are compared by their json, so unlike in a dict 1, 1.0 and true are different values here.
+    The results of the recent lookups are kept in memory, the subclasses read the file in _find and _has_value_text.
+    """
+
+    def __init__(self, hot_size=None):
+        """
+        :param hot_size: int number of recent lookups kept in memory, STORE_HOT_SIZE by default
+        """
+        self.hot = LRUCache(STORE_HOT_SIZE if hot_size is None else hot_size)
+        self.hot_values = LRUCache(STORE_HOT_SIZE if hot_size is None else hot_size)
+
+    @abc.abstractmethod
+    def _find(self, text):
+        """
+        :param text: str json of a key
+        :return: the value of the key, _NOT_FOUND if it is not in the enum
+        """
+
+    @abc.abstractmethod
+    def _has_value_text(self, text):
+        """
+        :param text: str json of a value
+        :return: bool
+        """
+
+    def get(self, key, default=None):
+        """
+        get the value of a key, also found by its normalized str or int
+        :param key: key of the enum
+        :param default: returned when the key is not in the enum
+        :return: value of the enum
+        """
+        # the type keeps 1, 1.0 and True apart in the cache
+        hot_key = (type(key), key)
+        value = self.hot.get(hot_key, _MISSING)
+        if value is _MISSING:
+            if isinstance(key, str):
+                value = self._find(_encode(key))
+                if value is _NOT_FOUND and key.isdigit():
+                    value = self._find(_encode(int(key)))
+            elif isinstance(key, int) or (isinstance(key, float) and key.is_integer()):
+                # like in a dict, True and 1.0 find the key 1
+                value = self._find(_encode(int(key)))
+                if value is _NOT_FOUND:
+                    value = self._find(_encode(str(key)))
+            else:
+                value = self._find(_encode(str(key)))
+            self.hot.put(hot_key, value)
+        return default if value is _NOT_FOUND else value
+
+    def has_value(self, value):
+        """
+        check if a value is one of the values of the enum
+        :param value: json value
+        :return: bool
+        """
+        hot_key = (type(value), value)
+        try:
+            found = self.hot_values.get(hot_key)
+        except TypeError:
+            # lists and dicts are not kept in the hot entries
+            hot_key = found = None
+        if found is None:
+            found = self._has_value_text(_encode(value))
+            if hot_key is not None:
+                self.hot_values.put(hot_key, found)
+        return found
+
+    def change(self, key):
+        """
+        get the value of a key, the key itself if it is one of the values, else None (the result of enum_change)
+        :param key: key of the enum
+        :return: value of the enum
+        """
+        value = self.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        return key if self.has_value(key) else None
+
+    def nbytes(self):
+        """
+        estimate the memory used by this process at most: the hot entries
+        :return: int bytes
+        """
+        return (self.hot.maxsize + self.hot_values.maxsize) * 200
+
+    def close(self):
+        """
+        close the file, it is opened again by the next lookup
+        """
+
+
+class EnumStore(DiskEnum):
+    """
+    an enum in a SQLite file written by build_enum_store, queried on demand.
+    """
+
+    def __init__(self, file_path, hot_size=None):
+        """
+        :param file_path: path of a file written by build_enum_store
+        :param hot_size: int number of recent lookups kept in memory, STORE_HOT_SIZE by default
+        """
+        super(EnumStore, self).__init__(hot_size)
+        self.file_path = file_path
+        self._lock = threading.Lock()
+        self._connection = None
+        self._pid = None
+        # fail now on a missing or invalid file
+        self._query('SELECT count(*) FROM enum LIMIT 1', ())
+
+    def _query(self, sql, parameters):
+        with self._lock:
+            # a connection can not be used by a forked process (e.g. the workers of Parallel)
+            if self._connection is None or self._pid != os.getpid():
+                import sqlite3
+                from urllib.parse import quote
+                uri = 'file:%s?mode=ro' % quote(os.path.abspath(self.file_path))
+                self._connection = sqlite3.connect(uri, uri=True, check_same_thread=False)
+                self._pid = os.getpid()
+            return self._connection.execute(sql, parameters).fetchone()
+
+    def _find(self, text):
+        row = self._query('SELECT value FROM enum WHERE key = ?', (text,))
+        return _NOT_FOUND if row is None else _DECODE(row[0])
+
+    def _has_value_text(self, text):
+        return self._query('SELECT 1 FROM enum WHERE value = ? LIMIT 1', (text,)) is not None
+
+    def __len__(self):
+        return self._query('SELECT count(*) FROM enum', ())[0]
+
+    def nbytes(self):
+        """
+        estimate the memory used at most: the hot entries and the page cache of SQLite (2 MB by default)
+        :return: int bytes
+        """
+        return super(EnumStore, self).nbytes() + (2 << 20)
+
+    def close(self):
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+
+# compact enum files shared by the processes (see MappedEnum)
+MAPPED_MAGIC = b'JTLENUM1'
+# magic, modification time (ns) and size of the source file, entries, slots, offsets of the key and value slots
+_MAPPED_HEADER = struct.Struct('<8sQQQQQQ')
+_UNPACK_LENGTH = struct.Struct('<I').unpack_from
+_UNPACK_OFFSET = struct.Struct('<Q').unpack_from
+# directory of the compact files built from the enum files, None: jtl-enums-<user id> in the temporary directory
+# (from the environment, so the worker processes started by spawn use the same)
+MAPPED_DIRECTORY = os.environ.get('JTL_ENUM_DIRECTORY')
+
+
+def _slot_count(entries):
+    # 哈希表至少一半是空位, 查找时探测次数少
+    slots = 8
+    while slots < entries * 2:
+        slots *= 2
+    return slots
+
+
+def _insert_slot(hashes, offsets, mask, hash_value, offset):
+    index = hash_value & mask
+    while offsets[index]:
+        index = (index + 1) & mask
+    hashes[index] = hash_value
+    offsets[index] = offset
+
+
+def build_mapped_enum(enum_dict, file_path, source_stat=(0, 0)):
+    """
+    write an enum to a compact file read by MappedEnum, replaced at once so the readers see either the old or the new
+    :param enum_dict: dict, keys are str or int
+    :param file_path: file path
+    :param source_stat: (modification time in ns, size) of the file the enum was read from, to know when to rebuild
+    :return: int number of entries written
+    """
+    import zlib
+    from array import array
+    slots = _slot_count(len(enum_dict))
+    mask = slots - 1
+    key_hashes, key_offsets = array('I', bytes(4 * slots)), array('Q', bytes(8 * slots))
+    value_hashes, value_offsets = array('I', bytes(4 * slots)), array('Q', bytes(8 * slots))
+    temp_path = '%s.%d.tmp' % (file_path, os.getpid())
+    try:
+        with open(temp_path, 'wb') as file:
+            # 记录: 长度 + 键的 json, 长度 + 值的 json
+            offset = file.write(bytes(_MAPPED_HEADER.size))
+            for key, value in enum_dict.items():
+                key_text = _encode(key).encode('utf-8')
+                value_text = _encode(value).encode('utf-8')
+                _insert_slot(key_hashes, key_offsets, mask, zlib.crc32(key_text), offset)
+                _insert_slot(value_hashes, value_offsets, mask, zlib.crc32(value_text), offset + 4 + len(key_text))
+                offset += file.write(struct.pack('<I', len(key_text)) + key_text +
+                                     struct.pack('<I', len(value_text)) + value_text)
+            key_table = offset
+            offset += file.write(key_hashes.tobytes()) + file.write(key_offsets.tobytes())
+            value_table = offset
+            file.write(value_hashes.tobytes())
+            file.write(value_offsets.tobytes())
+            file.seek(0)
+            file.write(_MAPPED_HEADER.pack(MAPPED_MAGIC, source_stat[0], source_stat[1], len(enum_dict), slots,
+                                           key_table, value_table))
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    os.replace(temp_path, file_path)
+    return len(enum_dict)
+
+
+class MappedEnum(DiskEnum):
+    """
+    an enum in a compact file written by build_mapped_enum, mapped in memory read only: the processes reading the same
+    file share its pages, and a lookup reads a few of them (an open addressing table of crc32 hashes).
+    """
+
+    def __init__(self, file_path, hot_size=None):
+        """
+        :param file_path: path of a file written by build_mapped_enum
+        :param hot_size: int number of recent lookups kept in memory, STORE_HOT_SIZE by default
+        """
+        import mmap
+        import zlib
+        super(MappedEnum, self).__init__(hot_size)
+        self.file_path = file_path
+        self._crc32 = zlib.crc32
+        with open(file_path, 'rb') as file:
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, mtime, size, self.entries, slots, key_table, value_table = _MAPPED_HEADER.unpack_from(self._map)
+        if magic != MAPPED_MAGIC:
+            self._map.close()
+            raise ValueError('%s is not a compact enum file' % file_path)
+        self.source_stat = (mtime, size)
+        self._mask = slots - 1
+        self._key_table = (key_table, key_table + 4 * slots)
+        self._value_table = (value_table, value_table + 4 * slots)
+
+    def _probe(self, table, text):
+        """
+        find the record of a json text in a hash table
+        :param table: (offset of the hashes, offset of the record offsets)
+        :param text: bytes
+        :return: int offset of the length of the text in the file, 0 if not found
+        """
+        data = self._map
+        hashes, offsets = table
+        hash_value = self._crc32(text)
+        index = hash_value & self._mask
+        length = len(text)
+        while True:
+            offset = _UNPACK_OFFSET(data, offsets + 8 * index)[0]
+            if not offset:
+                return 0
+            if (_UNPACK_LENGTH(data, hashes + 4 * index)[0] == hash_value and
+                    _UNPACK_LENGTH(data, offset)[0] == length and data[offset + 4:offset + 4 + length] == text):
+                return offset
+            index = (index + 1) & self._mask
+
+    def _find(self, text):
+        text = text.encode('utf-8')
+        offset = self._probe(self._key_table, text)
+        if not offset:
+            return _NOT_FOUND
+        offset += 4 + len(text)
+        length = _UNPACK_LENGTH(self._map, offset)[0]
+        return _DECODE(self._map[offset + 4:offset + 4 + length].decode('utf-8'))
+
+    def _has_value_text(self, text):
+        return self._probe(self._value_table, text.encode('utf-8')) != 0
+
+    def __len__(self):
+        return self.entries
+
+    def close(self):
+        # 映射由各进程共享, 在对象回收时才关闭, 以免影响其他线程的查询
+        pass
+
+
+def mapped_directory():
+    """
+    the directory of the compact files: MAPPED_DIRECTORY, else one per user in the temporary directory
+    :return: str
+    """
+    import tempfile
+    if MAPPED_DIRECTORY:
+        return MAPPED_DIRECTORY
+    if hasattr(os, 'getuid'):
+        return os.path.join(tempfile.gettempdir(), 'jtl-enums-%d' % os.getuid())
+    # 其他系统的临时目录本来就是每个用户一个
+    return os.path.join(tempfile.gettempdir(), 'jtl-enums')
+
+
+def private_directory(directory):
+    """
+    create a directory only the current user can use, or check that an existing one is
+    :param directory: path
+    :raise PermissionError: when the path is not a directory, belongs to another user, or other users can write in it
+    """
+    import stat
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    # lstat: a symbolic link planted by another user is refused too
+    info = os.lstat(directory)
+    if not stat.S_ISDIR(info.st_mode):
+        raise PermissionError('%s is not a directory' % directory)
+    if hasattr(os, 'getuid'):
+        if info.st_uid != os.getuid():
+            raise PermissionError('%s belongs to another user' % directory)
+        if info.st_mode & 0o022:
+            raise PermissionError('%s can be written by other users (mode %o)' % (directory, stat.S_IMODE(info.st_mode)))
+
+
+def mapped_file_path(source_path):
+    """
+    the path of the compact file built from an enum file
+    :param source_path: path of the enum file
+    :return: str
+    """
+    import zlib
+    source_path = os.path.abspath(source_path)
+    name = '%s-%08x.jtlenum' % (os.path.basename(source_path), zlib.crc32(source_path.encode('utf-8')))
+    return os.path.join(mapped_directory(), name)
+
+
+def mapped_enum(source_path, source_stat, load):
+    """
+    map the compact file of an enum file, building it first if it is missing or older than the enum file.
+    The compact files are only trusted in a directory private to the current user (see private_directory), else the
+    enum file is loaded in memory.
+    :param source_path: path of the enum file
+    :param source_stat: (modification time in ns, size) of the enum file
+    :param load: f(source_path) -> dict reads the enum file
+    :return: MappedEnum, or the dict of the enum when the directory is not private
+    """
+    file_path = mapped_file_path(source_path)
+    try:
+        private_directory(os.path.dirname(file_path))
+    except PermissionError as e:
+        import logging
+        logging.warning('enum file %s not shared: %s', source_path, e)
+        return load(source_path)
+    try:
+        mapped = MappedEnum(file_path)
+        if mapped.source_stat == tuple(source_stat):
+            return mapped
+    except (OSError, ValueError, struct.error):
+        pass
+    enum_dict = load(source_path)
+    assert isinstance(enum_dict, dict)
+    build_mapped_enum(enum_dict, file_path, source_stat)
+    return MappedEnum(file_path)
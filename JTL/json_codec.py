@@ -0,0 +1,210 @@
+# -*- coding:utf-8 -*-
+"""
+json codec: encode and decode json with the json module, or a faster backend asked for (orjson, ujson)
+
+The backend is chosen on first use: JSON_BACKEND if set, else the environment variable JTL_JSON_BACKEND, else the json
+module; 'auto' picks the first installed of BACKENDS. The faster backends are opt-in, as they do not read and write
+every document exactly like json does (see OrjsonCodec). The values json does not know (datetime, Decimal, UUID, bytes,
+set...) are converted by json_util.json_serializable with every backend, and what a fast backend can not do the same
+way is done by json.
+"""
+import os
+import sys
+import json
+
+# backends which can be chosen, 'auto' takes the first installed
+BACKENDS = ('orjson', 'ujson', 'json')
+AUTO_BACKEND = 'auto'
+# backend used when none is chosen: the reference behavior
+DEFAULT_BACKEND = 'json'
+# environment variable naming the backend to use
+ENV_VARIABLE = 'JTL_JSON_BACKEND'
+# name of the backend to use, None: from the environment variable, else DEFAULT_BACKEND
+JSON_BACKEND = None
+
+_codec = None
+
+
+def _default(value):
+    # json_serializable 延迟导入, 避免 json_util 和本模块循环导入
+    from JTL.json_util import json_serializable
+    return json_serializable(value)
+
+
+class JsonCodec(object):
+    """
+    The json module: the reference behavior of every backend.
+    """
+    name = 'json'
+
+    def loads(self, value):
+        """
+        change a json string to a value
+        :param value: str | bytes
+        :return: json value
+        :raise ValueError: for invalid json
+        """
+        return json.loads(value)
+
+    def dumps(self, value, indent=None, sort_keys=False, ensure_ascii=True):
+        """
+        change a value to a json string
+        :param value: json value, the other values are converted by json_util.json_serializable
+        :param indent: int | None for compact json
+        :param sort_keys: bool
+        :param ensure_ascii: bool escape the non ascii characters (\\uXXXX), for outputs in any encoding
+        :return: str
+        """
+        separators = None if indent is not None else (',', ':')
+        return json.dumps(value, indent=indent, sort_keys=sort_keys, ensure_ascii=ensure_ascii, separators=separators,
+                          default=_default)
+
+
+class OrjsonCodec(JsonCodec):
+    """
+    orjson. What it does not do like json is given to json: the documents it rejects (NaN, Infinity, non utf-8 bytes),
+    the values it can not write (keys which are not strings, integers over 64 bits), indents other than 2 and UUID
+    (that orjson always writes as hyphenated strings).
+    Two differences are left, as finding them would cost more than orjson saves: NaN and infinities are written as null
+    (so defaultNan results become null), and integers over 64 bits in documents are read as floats. That is why it is
+    only used when asked for.
+    """
+    name = 'orjson'
+
+    def __init__(self):
+        import orjson
+        self.orjson = orjson
+        # dates are written by json_serializable, which drops the microseconds and the time zone
+        self.option = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+
+    def loads(self, value):
+        try:
+            return self.orjson.loads(value)
+        except self.orjson.JSONDecodeError:
+            return json.loads(value)
+
+    def dumps(self, value, indent=None, sort_keys=False, ensure_ascii=True):
+        if (indent is not None and indent != 2) or ('uuid' in sys.modules and _contains_uuid(value)):
+            return JsonCodec.dumps(self, value, indent, sort_keys, ensure_ascii)
+        option = self.option
+        if indent is not None:
+            option |= self.orjson.OPT_INDENT_2
+        if sort_keys:
+            option |= self.orjson.OPT_SORT_KEYS
+        try:
+            text = self.orjson.dumps(value, default=_orjson_default, option=option).decode('utf-8')
+        except TypeError:
+            return JsonCodec.dumps(self, value, indent, sort_keys, ensure_ascii)
+        # orjson can not escape the non ascii characters: json does it for the values which have some
+        if ensure_ascii and not text.isascii():
+            return JsonCodec.dumps(self, value, indent, sort_keys, ensure_ascii)
+        return text
+
+
+def _orjson_default(value):
+    # json 把 tuple 的子类(如 time.struct_time)当作 list 输出
+    if isinstance(value, tuple):
+        return list(value)
+    return _default(value)
+
+
+def _contains_uuid(value):
+    """
+    check if a value contains an uuid.UUID
+    :param value: json value
+    :return: bool
+    """
+    uuid_type = sys.modules['uuid'].UUID
+    stack = [value]
+    while stack:
+        value = stack.pop()
+        if isinstance(value, dict):
+            stack.extend(value.values())
+            stack.extend(value.keys())
+        elif isinstance(value, (list, tuple, set)):
+            stack.extend(value)
+        elif isinstance(value, uuid_type):
+            return True
+    return False
+
+
+class UjsonCodec(JsonCodec):
+    """
+    ujson (5.4 or later, for the default argument). The documents and values it rejects are given to json.
+    """
+    name = 'ujson'
+
+    def __init__(self):
+        import ujson
+        self.ujson = ujson
+
+    def loads(self, value):
+        try:
+            return self.ujson.loads(value)
+        except ValueError:
+            return json.loads(value)
+
+    def dumps(self, value, indent=None, sort_keys=False, ensure_ascii=True):
+        try:
+            return self.ujson.dumps(value, indent=indent or 0, sort_keys=sort_keys, ensure_ascii=ensure_ascii,
+                                    escape_forward_slashes=False, default=_default)
+        except (TypeError, ValueError, OverflowError):
+            return JsonCodec.dumps(self, value, indent, sort_keys, ensure_ascii)
+
+
+CODECS = {'orjson': OrjsonCodec, 'ujson': UjsonCodec, 'json': JsonCodec}
+
+
+def set_backend(name=None):
+    """
+    choose the json backend
+    :param name: 'orjson', 'ujson', 'json' or 'auto' for the first installed. None: JSON_BACKEND, else the environment
+        variable, else DEFAULT_BACKEND
+    :return: the codec
+    :raise ValueError: for an unknown backend
+    :raise ImportError: when the backend asked for is not installed
+    """
+    global _codec
+    name = name or JSON_BACKEND or os.environ.get(ENV_VARIABLE) or DEFAULT_BACKEND
+    if name == AUTO_BACKEND:
+        for backend in BACKENDS:
+            try:
+                _codec = CODECS[backend]()
+                break
+            except ImportError:
+                pass
+    elif name in CODECS:
+        _codec = CODECS[name]()
+    else:
+        raise ValueError('unknown json backend %r, expected one of %s' % (name, ', '.join(BACKENDS + (AUTO_BACKEND,))))
+    return _codec
+
+
+def get_codec():
+    """
+    the json codec in use, chosen on first use
+    :return: JsonCodec
+    """
+    return _codec or set_backend()
+
+
+def loads(value):
+    """
+    change a json string to a value with the backend in use
+    :param value: str | bytes
+    :return: json value
+    :raise ValueError: for invalid json
+    """
+    return (_codec or set_backend()).loads(value)
+
+
+def dumps(value, indent=None, sort_keys=False, ensure_ascii=True):
+    """
+    change a value to a json string with the backend in use
+    :param value: json value, the other values are converted by json_util.json_serializable
+    :param indent: int | None for compact json
+    :param sort_keys: bool
+    :param ensure_ascii: bool escape the non ascii characters (\\uXXXX)
+    :return: str
+    """
+    return (_codec or set_backend()).dumps(value, indent, sort_keys, ensure_ascii)
@@ -4,13 +4,17 @@ json Utility
 """
 import os
 import sys
+import copy
 import json
-import uuid
 import time
 import datetime
-import base64
-import logging
-import decimal
+import codecs
+import threading
+import collections
+
+from JTL import enum_store
+from JTL import json_codec
+from JTL.Utility import LRUCache
 
 # base file path, for found files
 BASE_PATH = os.getcwd()
@@ -24,8 +28,22 @@ if default_code not in DECODE_CODING_LIST:
 if default_code not in ENCODE_CODING_LIST:
     ENCODE_CODING_LIST[-1:-1] = [default_code]
 
-# enum file json cache
-BIG_ENUM_JSON = {}
+# enum file cache (BIG_ENUM_JSON): memory budget of the enum tables in bytes, the least recently used are dropped over it
+ENUM_CACHE_MAX_BYTES = 128 << 20
+# seconds between two checks of the modification time and size of an enum file, to reload it when it changed
+ENUM_FILE_CHECK_INTERVAL = 5.0
+# True: every enum file is read through a compact file mapped in memory, shared by the processes (see preload)
+ENUM_SHARED = False
+
+# True: load_json only accepts JSON, False: it also accepts python literals like "{1: 'one', 'n': None}"
+STRICT_JSON = False
+# python literals parsed by load_json, so repeated tokens are not parsed again
+LITERAL_CACHE = LRUCache(1024)
+# longer strings (e.g. whole files) are not kept in LITERAL_CACHE
+LITERAL_CACHE_MAX_LENGTH = 4096
+# json names allowed inside python literals
+LITERAL_NAMES = {'true': True, 'false': False, 'null': None}
+_MISSING = object()
 
 
 def decode2str(content):
@@ -120,6 +138,7 @@ def to_utf8_bytes(content):
 
 def base64_encode(s):
     """使用base64加密"""
+    import base64
     s = encode2bytes(s)
     res = base64.b64encode(s)
     return decode2str(res)
@@ -127,11 +146,359 @@ def base64_encode(s):
 
 def base64_decode(s):
     """使用base64解码"""
+    import base64
     s = encode2bytes(s)
     res = base64.b64decode(s)
     return decode2str(res)
 
 
+def _is_int_key(key):
+    # bool 是 int 的子类, 但 str(True) 是 'True', 不是数字
+    return type(key) is int or (isinstance(key, int) and not isinstance(key, bool))
+
+
+class EnumTable(object):
+    """
+    an enum dict indexed once, so every lookup is O(1) whatever the key type or the size of the enum:
+    a str of digits also finds its int key, an int or other key also finds its str key, and the values are in a set.
+    The dict is not modified.
+    """
+    __slots__ = ('table', 'digit_keys', 'int_keys', 'values', 'unhashable_values')
+
+    def __init__(self, table):
+        """
+        :param table: dict of the enum
+        """
+        self.table = table
+        # str of digits -> value of the int key (the int lookup of a str of digits)
+        self.digit_keys = {}
+        # int -> value of the str key (the str lookup of an int)
+        self.int_keys = {}
+        self.values = set()
+        self.unhashable_values = []
+        for key, value in table.items():
+            if isinstance(key, str):
+                if key.isdigit() or (key[:1] == '-' and key[1:].isdigit()):
+                    try:
+                        number = int(key)
+                    except ValueError:
+                        number = None
+                    if number is not None and str(number) == key:
+                        self.int_keys[number] = value
+            elif _is_int_key(key) and key >= 0:
+                self.digit_keys[str(key)] = value
+            try:
+                self.values.add(value)
+            except TypeError:
+                self.unhashable_values.append(value)
+
+    def __len__(self):
+        return len(self.table)
+
+    def get(self, key, default=None):
+        """
+        get the value of a key, also found by its normalized str or int
+        :param key: key of the enum
+        :param default: returned when the key is not in the enum
+        :return: value of the enum
+        """
+        value = self.table.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        if isinstance(key, str):
+            value = self.digit_keys.get(key, _MISSING)
+            if value is _MISSING and key.isdigit():
+                # 非规范的数字, 如 '007'
+                value = self.table.get(int(key), default)
+        elif _is_int_key(key):
+            value = self.int_keys.get(key, _MISSING)
+        else:
+            value = self.table.get(str(key), _MISSING)
+        return default if value is _MISSING else value
+
+    def has_value(self, value):
+        """
+        check if a value is one of the values of the enum
+        :param value: any value
+        :return: bool
+        """
+        try:
+            if value in self.values:
+                return True
+        except TypeError:
+            pass
+        return bool(self.unhashable_values) and value in self.unhashable_values
+
+    def change(self, key):
+        """
+        get the value of a key, the key itself if it is one of the values, else None (the result of enum_change)
+        :param key: key of the enum
+        :return: value of the enum
+        """
+        value = self.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        return key if self.has_value(key) else None
+
+    def nbytes(self):
+        """
+        estimate the memory used by the enum and its index
+        :return: int bytes
+        """
+        getsizeof = sys.getsizeof
+        return (_table_bytes(self.table) + getsizeof(self.values) + getsizeof(self.unhashable_values) +
+                _table_bytes(self.digit_keys) + _table_bytes(self.int_keys))
+
+
+# inline enums (the str argument of enumChange / enumOrKey) interned by their literal text, parsed and indexed once
+ENUM_TABLE_CACHE = LRUCache(1024)
+
+
+def enum_table(enum_dict):
+    """
+    get the indexed enum of an enumChange / enumOrKey argument
+    :param enum_dict: EnumTable | dict | str of a json or python literal dict (indexed once, then cached)
+    :return: EnumTable, the same one for the same literal; it must not be modified
+    """
+    if isinstance(enum_dict, EnumTable):
+        return enum_dict
+    if isinstance(enum_dict, str):
+        table = ENUM_TABLE_CACHE.get(enum_dict)
+        if table is None:
+            value = load_json(enum_dict)
+            assert isinstance(value, dict)
+            table = EnumTable(value)
+            ENUM_TABLE_CACHE.put(enum_dict, table)
+        return table
+    assert isinstance(enum_dict, dict)
+    return EnumTable(enum_dict)
+
+
+class _EnumFile(object):
+    """
+    an enum table loaded from a file, with what is needed to know when to reload it
+    """
+    __slots__ = ('table', 'index', 'path', 'stat', 'checked', 'nbytes')
+
+    def __init__(self, table, path, stat):
+        """
+        :param table: dict of the enum, or an enum_store.EnumStore (then it is its own index)
+        """
+        self.table = table
+        self.index = EnumTable(table) if isinstance(table, dict) else table
+        self.path = path
+        self.stat = stat
+        self.checked = time.monotonic()
+        self.nbytes = self.index.nbytes()
+
+
+def _file_stat(path):
+    """
+    :param path: file path
+    :return: (modification time in ns, size), None if the file can not be read
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _table_bytes(table):
+    """
+    estimate the memory used by an enum table
+    :param table: dict
+    :return: int bytes
+    """
+    getsizeof = sys.getsizeof
+    return getsizeof(table) + sum(getsizeof(key) + getsizeof(value) for key, value in table.items())
+
+
+class EnumFileCache(object):
+    """
+    the enum tables of enum_file_change, by file name.
+
+    Tables are dropped from the least recently used once their estimated size is over max_bytes, and reloaded when the
+    modification time or the size of their file changed (checked every check_interval seconds).
+    The files with an extension of enum_store.STORE_EXTENSIONS are read on demand with an enum_store.EnumStore.
+    The shared files (see preload) are read through a compact file mapped in memory, an enum_store.MappedEnum,
+    whose pages are shared by all the processes reading it.
+    The tables are never modified, lookups go through their EnumTable index.
+    Like a dict, len() is the number of tables loaded and get(file_name) a loaded table.
+    """
+
+    def __init__(self, max_bytes=None, check_interval=None):
+        """
+        :param max_bytes: int memory budget of the tables, ENUM_CACHE_MAX_BYTES by default
+        :param check_interval: float seconds between two checks of a file, ENUM_FILE_CHECK_INTERVAL by default
+        """
+        self.max_bytes = ENUM_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+        self.check_interval = ENUM_FILE_CHECK_INTERVAL if check_interval is None else check_interval
+        self._files = collections.OrderedDict()
+        self._lock = threading.Lock()
+        # names of the files read as an enum_store.MappedEnum
+        self.shared = set()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.loads = 0
+        self.reloads = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._files)
+
+    def __contains__(self, file_name):
+        return file_name in self._files
+
+    def get(self, file_name, default=None):
+        """
+        the table of a file if it is loaded
+        :param file_name: file path, as given to enum_file_change
+        :param default: returned when the file is not loaded
+        :return: dict
+        """
+        entry = self._files.get(file_name)
+        return default if entry is None else entry.table
+
+    def table(self, file_name):
+        """
+        the table of a file, loaded or reloaded if needed
+        :param file_name: file path, absolute or relative to BASE_PATH
+        :return: dict
+        """
+        return self._entry(file_name).table
+
+    def preload(self, file_names):
+        """
+        load enum files once into shared read only memory, e.g. before starting worker processes: each file is
+        converted to a compact file (rebuilt when the enum file changes) mapped in memory, so all the processes read
+        the same pages instead of parsing the file into their own copy
+        :param file_names: iterable of file paths, as given to enum_file_change
+        """
+        for file_name in file_names:
+            if file_name not in self.shared:
+                self.shared.add(file_name)
+                if file_name in self._files:
+                    # 已经以 dict 读入的, 换成共享的
+                    self._load(file_name, self._files[file_name])
+            self.table(file_name)
+
+    def lookup(self, key, file_name):
+        """
+        get the value of a key in the enum table of a file
+        :param key: key of enum json, a str of digits also finds an int key and any other key its str
+        :param file_name: file path, absolute or relative to BASE_PATH
+        :return: value of enum json, the key if it is one of the values, else None
+        """
+        index = self._entry(file_name).index
+        value = index.get(key, _MISSING)
+        if value is not _MISSING:
+            self.hits += 1
+            return value
+        self.misses += 1
+        return key if index.has_value(key) else None
+
+    def _entry(self, file_name):
+        entry = self._files.get(file_name)
+        if entry is None:
+            return self._load(file_name)
+        now = time.monotonic()
+        if now - entry.checked >= self.check_interval:
+            entry.checked = now
+            stat = _file_stat(entry.path)
+            if stat is not None and stat != entry.stat:
+                entry = self._load(file_name, entry)
+        try:
+            self._files.move_to_end(file_name)
+        except KeyError:
+            # dropped by another thread in the meantime
+            pass
+        return entry
+
+    def _load(self, file_name, old=None):
+        """
+        load (or reload) the table of a file, then drop the least recently used tables over the budget
+        :param file_name: file path
+        :param old: _EnumFile loaded before, kept if the file can not be read anymore
+        :return: _EnumFile
+        """
+        path = _find_file(file_name)
+        stat = path and _file_stat(path)
+        table = None
+        if stat and enum_store.is_store_file(path):
+            try:
+                table = enum_store.EnumStore(path)
+            except Exception:
+                if old is None:
+                    raise
+        elif stat and (ENUM_SHARED or file_name in self.shared):
+            try:
+                table = enum_store.mapped_enum(path, stat, load_json_file)
+            except Exception:
+                if old is None:
+                    raise
+        elif stat:
+            table = load_json_file(path)
+        if table is None or not isinstance(table, (dict, enum_store.DiskEnum)):
+            if old is not None:
+                # 文件正在被改写或已删除: 继续用旧的枚举
+                return old
+            assert isinstance(table, dict)
+        entry = _EnumFile(table, path, stat)
+        with self._lock:
+            previous = self._files.pop(file_name, None)
+            if previous is not None:
+                self.nbytes -= previous.nbytes
+                self.reloads += 1
+            else:
+                self.loads += 1
+            self._files[file_name] = entry
+            self.nbytes += entry.nbytes
+            # the table just loaded is kept even if it is alone over the budget
+            dropped = [] if previous is None else [previous]
+            while self.nbytes > self.max_bytes and len(self._files) > 1:
+                dropped.append(self._files.popitem(last=False)[1])
+                self.nbytes -= dropped[-1].nbytes
+                self.evictions += 1
+        for dropped_entry in dropped:
+            if isinstance(dropped_entry.table, enum_store.DiskEnum):
+                dropped_entry.table.close()
+        return entry
+
+    def clear(self):
+        """
+        drop every table, forget the shared files and reset the counters
+        """
+        with self._lock:
+            self._files.clear()
+            self.nbytes = 0
+            self.hits = self.misses = 0
+            self.loads = self.reloads = self.evictions = 0
+            self.shared.clear()
+
+    def info(self):
+        """
+        the cache counters
+        :return: dict
+        """
+        return {
+            'files': len(self._files),
+            'shared': len(self.shared),
+            'bytes': self.nbytes,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'loads': self.loads,
+            'reloads': self.reloads,
+            'evictions': self.evictions,
+        }
+
+
+# enum file json cache
+BIG_ENUM_JSON = EnumFileCache()
+
+
 def enum_file_change(key, file_name):
     """big enum json load by a file
     :param key: key of enum json
@@ -140,37 +507,7 @@ def enum_file_change(key, file_name):
 
     use in JTL: "<SELECTOR> $ enumFileChange '/data/example_enum.json' "
     """
-    global BIG_ENUM_JSON
-    if file_name in BIG_ENUM_JSON:
-        enum_dict = BIG_ENUM_JSON.get(file_name)
-    else:
-        enum_dict = load_json_file(file_name)
-        assert isinstance(enum_dict, dict)
-        BIG_ENUM_JSON[file_name] = enum_dict
-
-    if key in enum_dict:
-        return enum_dict.get(key)
-
-    if isinstance(key, str):
-        if key.isdigit():
-            tem_key = int(key)
-            if tem_key in enum_dict:
-                target = enum_dict.get(tem_key)
-                enum_dict[key] = target
-                return target
-    else:
-        tem_key = str(key)
-        if tem_key in enum_dict:
-            target = enum_dict.get(tem_key)
-            enum_dict[key] = target
-            return target
-
-    if key in enum_dict.values():
-        enum_dict[key] = key
-        return key
-
-    enum_dict[key] = None
-    return None
+    return BIG_ENUM_JSON.lookup(key, file_name)
 
 
 def enum_change(key, enum_dict):
@@ -181,9 +518,9 @@ def enum_change(key, enum_dict):
 
     use in JTL: '''<SELECTOR> $ enumChange '{"F": "女", "M": "男"}' '''
     """
-    if isinstance(enum_dict, str):
-        enum_dict = load_json(enum_dict)
-        assert isinstance(enum_dict, dict)
+    if isinstance(enum_dict, (str, EnumTable)):
+        return enum_table(enum_dict).change(key)
+    assert isinstance(enum_dict, dict)
 
     if key in enum_dict:
         return enum_dict.get(key)
@@ -211,10 +548,11 @@ def enum_or_key(key, enum_dict):
 
     use in JTL: '''<SELECTOR> $ enumOrKey '{"F": "女", "M": "男"}' '''
     """
-    if isinstance(enum_dict, str):
-        enum_dict = load_json(enum_dict)
-        assert isinstance(enum_dict, dict)
+    if isinstance(enum_dict, (str, EnumTable)):
+        return enum_table(enum_dict).get(key, key)
+    assert isinstance(enum_dict, dict)
 
+    # 枚举是只读的, 不回写查询结果
     if key in enum_dict:
         return enum_dict.get(key)
 
@@ -222,24 +560,62 @@ def enum_or_key(key, enum_dict):
         if key.isdigit():
             tem_key = int(key)
             if tem_key in enum_dict:
-                value = enum_dict.get(tem_key)
-                enum_dict[key] = value
-                return value
+                return enum_dict.get(tem_key)
     else:
         tem_key = str(key)
         if tem_key in enum_dict:
-            value = enum_dict.get(tem_key)
-            enum_dict[key] = value
-            return value
-
-    enum_dict[key] = key
+            return enum_dict.get(tem_key)
     return key
 
 
-def load_json(value):
+_literal_names = None
+
+
+def _literal_names_transformer():
+    """
+    the ast transformer replacing the json names true/false/null by python constants,
+    built on first use so ast is only imported when a literal is parsed
+    """
+    global _literal_names
+    if _literal_names is None:
+        import ast
+
+        class LiteralNames(ast.NodeTransformer):
+            def visit_Name(self, node):
+                if node.id in LITERAL_NAMES:
+                    return ast.copy_location(ast.Constant(LITERAL_NAMES[node.id]), node)
+                return node
+
+        _literal_names = LiteralNames()
+    return _literal_names
+
+
+def load_literal(value):
+    """
+    change a python literal string to value, without running any code
+    :param value: string, like "{1: 'one', 'n': None, 'b': true}"
+    :return: the value, or None if it is not a literal
+    """
+    import ast
+    try:
+        node = ast.parse(value.lstrip(' \t'), mode='eval')
+        return ast.literal_eval(_literal_names_transformer().visit(node))
+    except (ValueError, TypeError, SyntaxError, MemoryError, RecursionError) as e:
+        return None
+
+
+def _copy_literal(value):
+    """cached literals are shared, so give out copies of the mutable ones"""
+    if isinstance(value, (dict, list, set)):
+        return copy.deepcopy(value)
+    return value
+
+
+def load_json(value, strict=None):
     """
     change strings to json
     :param value: string
+    :param strict: True: only json is accepted, False: python literals are accepted too, None: use STRICT_JSON
     :return: json dict
     """
     if value is None:
@@ -249,28 +625,36 @@ def load_json(value):
         value = decode2str(value)
     if not isinstance(value, str):
         return None
+    if strict is None:
+        strict = STRICT_JSON
+
+    # only python literals are cached, so a cached string is known not to be json
+    cacheable = not strict and len(value) <= LITERAL_CACHE_MAX_LENGTH
+    if cacheable:
+        cached = LITERAL_CACHE.get(value, _MISSING)
+        if cached is not _MISSING:
+            return _copy_literal(cached)
 
     try:
-        return json.loads(value)
+        return json_codec.loads(value)
     except ValueError as e:
         pass
+    if strict:
+        return None
 
     # Maybe that's a python value
-    try:
-        # fix json works: true, false, null ...
-        true = True
-        false = False
-        null = None
-        return eval(value)
-    except Exception as e:
-        return None
+    result = load_literal(value)
+    if cacheable:
+        LITERAL_CACHE.put(value, result)
+        return _copy_literal(result)
+    return result
 
 
-def load_json_file(file_path):
+def _find_file(file_path):
     """
-    read file to json
+    find a file, relative paths are also searched from BASE_PATH
     :param file_path: file path
-    :return: json dict
+    :return: the path of the file, None if not found
     """
     if not os.path.isfile(file_path):
         if file_path.startswith('/'):
@@ -279,6 +663,18 @@ def load_json_file(file_path):
             file_path = os.path.join(BASE_PATH, file_path)
             if not os.path.isfile(file_path):
                 return None
+    return file_path
+
+
+def load_json_file(file_path):
+    """
+    read file to json
+    :param file_path: file path
+    :return: json dict
+    """
+    file_path = _find_file(file_path)
+    if file_path is None:
+        return None
 
     with open(file_path, 'r', encoding='utf-8') as load_f:
         value = load_f.read()
@@ -286,6 +682,169 @@ def load_json_file(file_path):
     return None
 
 
+def compile_projection(paths):
+    """
+    build the tree of the fields used from a list of paths
+    :param paths: iterable of tuples of keys, like ('weather', 'temp'); an empty tuple means the whole document
+    :return: dict like {'weather': {'temp': True}} (True: the whole value), or None when the whole document is needed
+    """
+    tree = {}
+    for keys in paths:
+        if not keys:
+            return None
+        node = tree
+        for key in keys[:-1]:
+            child = node.get(key)
+            if child is True:
+                break
+            if child is None:
+                child = node[key] = {}
+            node = child
+        else:
+            node[keys[-1]] = True
+    return tree
+
+
+def project_json(value, projection):
+    """
+    keep only the fields of a projection
+    :param value: json dict
+    :param projection: tree from compile_projection, None to keep everything
+    :return: json dict
+    """
+    if projection is None or not isinstance(value, dict):
+        return value
+    result = {}
+    for key, sub in projection.items():
+        if key in value:
+            field = value[key]
+            if sub is True:
+                result[key] = field
+            elif isinstance(field, dict):
+                result[key] = project_json(field, sub)
+    return result
+
+
+def load_json_projection(value, projection):
+    """
+    change a json document to a value, keeping only the fields of a projection.
+    the document is decoded whole (with the backend of json_codec), then the other fields are dropped
+    :param value: str | bytes json document
+    :param projection: tree from compile_projection, None to keep everything
+    :return: json dict
+    :raise ValueError: for invalid json, unlike load_json
+    """
+    return project_json(json_codec.loads(value), projection)
+
+
+# characters read at once by iter_json_array
+STREAM_CHUNK_SIZE = 1 << 16
+_DECODER = json.JSONDecoder()
+_WHITESPACE = ' \t\n\r'
+_NUMBER_CHARS = '0123456789.eE+-'
+
+
+def iter_json_array(stream, chunk_size=None):
+    """
+    yield the elements of a top-level json array one by one, without loading the whole document
+    :param stream: text or binary (utf-8) file
+    :param chunk_size: characters read at once, default STREAM_CHUNK_SIZE
+    :return: generator of the json elements
+    :raise ValueError: for invalid json, or data after the array (once its elements were yielded)
+    """
+    chunk_size = chunk_size or STREAM_CHUNK_SIZE
+    decoder = None
+    buffer = ''
+    pos = 0
+    eof = False
+
+    def fill(size):
+        """append at least size more characters to the buffer, return False at the end of the stream"""
+        nonlocal buffer, pos, decoder, eof
+        if eof:
+            return False
+        data = stream.read(size)
+        if isinstance(data, bytes):
+            if decoder is None:
+                decoder = codecs.getincrementaldecoder('utf-8-sig')()
+            text = decoder.decode(data, final=not data)
+        else:
+            text = data
+        if not data:
+            eof = True
+        # drop what was already decoded
+        buffer = buffer[pos:] + text
+        pos = 0
+        return bool(text) or not eof
+
+    def skip_whitespace():
+        nonlocal pos
+        while True:
+            while pos < len(buffer) and buffer[pos] in _WHITESPACE:
+                pos += 1
+            if pos < len(buffer) or not fill(chunk_size):
+                return pos < len(buffer)
+
+    def check_end():
+        """after the closing ], only whitespace may be left"""
+        nonlocal pos
+        pos += 1
+        if skip_whitespace():
+            raise ValueError('extra data after the json array: %r' % buffer[pos:pos + 20])
+
+    if not skip_whitespace() or buffer[pos] != '[':
+        raise ValueError('the json document is not an array')
+    pos += 1
+    if not skip_whitespace():
+        raise ValueError('unterminated json array')
+    if buffer[pos] == ']':
+        check_end()
+        return
+
+    while True:
+        # a value ending with the buffer may continue (e.g. a number cut before its "." or "e"),
+        # so it is decoded again with more data
+        need = chunk_size
+        while True:
+            try:
+                value, end = _DECODER.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                end = None
+            if end is not None and (eof or end < len(buffer) and buffer[end] not in _NUMBER_CHARS):
+                break
+            if not fill(max(need, len(buffer) - pos)):
+                if end is None:
+                    # raise the decoding error of the truncated value
+                    _DECODER.raw_decode(buffer, pos)
+                break
+            need *= 2
+        pos = end
+        yield value
+
+        if not skip_whitespace():
+            raise ValueError('unterminated json array')
+        if buffer[pos] == ']':
+            check_end()
+            return
+        if buffer[pos] != ',':
+            raise ValueError('expected , or ] after the element %r of the array' % (value,))
+        pos += 1
+        if not skip_whitespace():
+            raise ValueError('unterminated json array')
+
+
+def _is_instance(value, module_name, type_name):
+    """
+    isinstance for the types of modules imported on demand: when the module was never imported, nothing is of its type
+    :param value: any value
+    :param module_name: str like 'decimal'
+    :param type_name: str like 'Decimal'
+    :return: bool
+    """
+    module = sys.modules.get(module_name)
+    return module is not None and isinstance(value, getattr(module, type_name))
+
+
 def json_serializable(value):
     """
     change the stings in (list, tuple, set, dict) to unicode
@@ -308,9 +867,9 @@ def json_serializable(value):
         return value.strftime('%Y-%m-%dT%H:%M:%S')
     elif isinstance(value, datetime.date):
         return value.strftime('%Y-%m-%d')
-    elif isinstance(value, decimal.Decimal):
+    elif _is_instance(value, 'decimal', 'Decimal'):
         return float(value)
-    elif isinstance(value, uuid.UUID):
+    elif _is_instance(value, 'uuid', 'UUID'):
         return value.hex
     # list,tuple,set recursion
     elif isinstance(value, (list, tuple, set)):
@@ -349,8 +908,9 @@ def dump_json_file(json_value, file_path):
         if not os.path.isdir(file_dir):
             os.makedirs(file_dir)
         with open(file_path, 'w', encoding='utf-8') as dump_file:
-            json.dump(json_value, dump_file, indent=1, ensure_ascii=False)
+            dump_file.write(json_codec.dumps(json_value, indent=1, ensure_ascii=False))
     except Exception as e:
+        import logging
         logging.error('write a json file error:%s', e, exc_info=True)
     return True
 
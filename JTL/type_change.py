@@ -21,7 +21,7 @@ DEFAULT_TIME_FORMAT = '%Y-%m-%dT%H:%M:%S'
 DEFAULT_DATE_FORMAT = '%Y-%m-%d'
 
 
-@Functions.registerMaybeFunction('toString')
+@Functions.registerMaybeFunction('toString', pure=True)
 def to_string(data):
     """change input to string"""
     # time, datetime
@@ -147,10 +147,30 @@ def jtl_change(data, config_json):
     if isinstance(data, dict):
         return Interpreter.transformJson(data, transform_data)
     elif isinstance(data, (tuple, list)):
-        return [jtl_change(d, transform_data) for d in data]
+        return _jtl_change_many(data, transform_data)
     return data
 
 
+def _jtl_change_many(data, transform_data):
+    """
+    JTL 转换列表里的每条数据，模板只编译一次
+    :param data: 源数据列表
+    :param transform_data: 已处理好的 JTL 模板
+    :return: list
+    """
+    compiled = None
+    result = []
+    for d in data:
+        if isinstance(d, dict):
+            # 第一条 dict 数据时才编译，和逐条转换时一样，没有 dict 数据就不会报模板的错
+            if compiled is None:
+                compiled = Interpreter.compileTemplate(transform_data)
+            result.append(compiled.apply(d))
+        else:
+            result.append(jtl_change(d, transform_data))
+    return result
+
+
 @Functions.registerFunction('countAge')
 def count_age(data, key=None):
     """
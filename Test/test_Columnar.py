@@ -0,0 +1,90 @@
+# -*- coding:utf-8 -*-
+"""
+Columnar unittest
+"""
+
+# Copyright (c) 2015-2021 Agalmic Ventures LLC (www.agalmicventures.com)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import unittest
+
+from JTL import Columnar
+from JTL import Functions
+from JTL import Interpreter
+from JTL import json_util
+
+
+class ColumnarTest(unittest.TestCase):
+
+    def setUp(self):
+        self.records = [
+            {'t': '66.5', 'a': 1, 'b': 2, 'w': {'city': 'Paris', 'n': [1, 2]}},
+            {'t': 'bad', 'a': None, 'b': 0, 'w': {'city': 'Rome', 'n': []}},
+            {'t': 12, 'a': 4, 'b': None, 'w': None},
+        ]
+        self.template = {
+            'f': 't $ toFloat $ * 1.8 $ + 32', 'i': 't $ toInt', 'hot': 't $ toFloat $ >= 50',
+            'sum': 'a $ + b', 'root': 'a $ sqrt $ floor', 'pow': 'a $ ** 2 $ - 1',
+            'w': {'city': 'w.city $ upper', 'first': 'w.n $ 0', 'len': 'w.n $ length'},
+            'list': '* $ list a b', 'const': 3, 'keys': '* $ keys $ sorted $ first',
+            'fun': ('w.city', lambda city: city and city[0]),
+        }
+
+    def test_applyRows(self):
+        compiled = Columnar.compileColumnar(self.template)
+        expected = list(Interpreter.transformMany(self.records, self.template))
+        self.assertEqual(compiled.required_columns(), ['*', 'a', 'b', 't', 'w.city', 'w.n'])
+        columns = Columnar.toColumns(self.records, compiled.required_columns())
+        self.assertEqual(compiled.apply_rows(columns), expected)
+
+        # Longer paths are read from the stored prefixes, the whole records rebuilt from the columns
+        columns = Columnar.toColumns(self.records, ['t', 'a', 'b', 'w'])
+        self.assertEqual(compiled.apply_rows(columns), expected)
+        self.assertEqual(compiled.apply_rows({'*': self.records}), expected)
+
+    def test_applyColumns(self):
+        compiled = Columnar.compileColumnar({'x': 'a $ * 2', 'y': {'z': 'b $ == 2'}, 'l': ['a']})
+        columns = compiled.apply_columns({'a': [1, None, 3], 'b': [2, 2, None]})
+        self.assertEqual(columns, {'x': [2, None, 6], 'y.z': [True, True, None], 'l': [[1], [None], [3]]})
+        self.assertEqual(Columnar.compileColumnar('a').apply_columns({'a': [1]}), {'': [1]})
+        self.assertEqual(Columnar.compileColumnar({'x': '$ list 1'}).apply_rows({}, size=2), [{'x': [1]}] * 2)
+        with self.assertRaises(ValueError):
+            compiled.apply_columns({'a': [1], 'b': [1, 2]})
+
+    def test_registeredFunctions(self):
+        Functions.register('jtlColumnarTwice', lambda x, n=2: x * n)
+        try:
+            compiled = Columnar.compileColumnar({'x': 'a $ jtlColumnarTwice', 'y': 'a $ jtlColumnarTwice b'})
+            self.assertEqual(compiled.apply_rows({'a': [1, 'a'], 'b': [3, 2]}), [{'x': 2, 'y': 3}, {'x': 'aa', 'y': 'aa'}])
+        finally:
+            Functions.unregister('jtlColumnarTwice')
+
+    def test_files(self):
+        for test_name in ["faa1", "test1"]:
+            _json = json_util.load_json_file('tests/%s.json' % test_name)
+            _config = json_util.load_json_file('tests/%s.jtl' % test_name)
+            _result = json_util.load_json_file('tests/%s.result' % test_name)
+            compiled = Columnar.compileColumnar(_config)
+            columns = Columnar.toColumns([_json, _json], compiled.required_columns())
+            self.assertEqual(compiled.apply_rows(columns), [_result, _result])
+
+
+if __name__ == "__main__":
+    unittest.main()
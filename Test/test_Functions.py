@@ -23,9 +23,15 @@ Functions unittest
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 
+import json
+import math
+import os
+import subprocess
+import sys
 import unittest
 
 from JTL import Functions
+from JTL import Interpreter
 
 
 class FunctionsTest(unittest.TestCase):
@@ -67,6 +73,74 @@ class FunctionsTest(unittest.TestCase):
         self.assertEqual(Functions.to_number(1.1), 1.1)
         self.assertEqual(Functions.to_number('1.23e7'), 12300000.0)
 
+    def test_elementwise(self):
+        f = Functions.functions
+        self.assertEqual(f['each+']([1, 2.5, None], 1), [2, 3.5, None])
+        self.assertEqual(f['each>=']([1, None, 3], 2), [False, None, True])
+        self.assertEqual(f['eachSqrt']([4, None, 2.25]), [2.0, None, 1.5])
+        self.assertEqual(f['eachFloor']([1.5, -1.5]), [1, -2])
+        self.assertEqual(f['each+']([None, None], 1), [None, None])
+        # Other values are passed as they are
+        self.assertEqual(f['each+']([1, 2], [3]), [1, 2, 3])
+        self.assertEqual(f['each*'](['a', 'b'], 2), ['a', 'b', 'a', 'b'])
+        self.assertEqual(f['each+'](1, 2), 3)
+        self.assertEqual(f['each+']([1, 2], None), None)
+        self.assertEqual(f['eachSqrt'](None), None)
+        with self.assertRaises(TypeError):
+            f['eachSqrt']([])
+        # The functions without each keep applying to the value as a whole
+        self.assertEqual(f['*']([2, 3], 2), [2, 3, 2, 3])
+        self.assertEqual(f['==']([1, 2], 1), False)
+        self.assertEqual(Interpreter.transform({}, '$ list 2 3 $ * 2'), [2, 3, 2, 3])
+        self.assertEqual(Interpreter.transform({'p': [1, None, 4]}, 'p $ eachSqrt $ each* 2'), [2.0, None, 4.0])
+
+        # Long float lists (numpy when installed) give the same results and errors as element by element
+        values = [0.5 * n for n in range(200)] + [None]
+        self.assertEqual(f['eachSqrt'](values), [None if v is None else math.sqrt(v) for v in values])
+        self.assertEqual(f['each*'](values, 3), [None if v is None else v * 3 for v in values])
+        self.assertEqual(f['each<'](values, 2), [None if v is None else v < 2 for v in values])
+        with self.assertRaises(ZeroDivisionError):
+            f['each/'](values, 0)
+        with self.assertRaises(ValueError):
+            f['eachLog'](values)
+
+    def test_unregister(self):
+        Functions.register('jtlUnregistered', len, pure=True)
+        self.assertEqual(Interpreter.transform({'a': 'xy'}, 'a $ jtlUnregistered'), 2)
+        Functions.unregister('jtlUnregistered')
+        self.assertNotIn('jtlUnregistered', Functions.functions)
+        self.assertNotIn('jtlUnregistered', Functions.pureFunctions)
+        self.assertNotIn('jtlUnregistered', Functions.registrations)
+        # Compiled templates using it are discarded
+        with self.assertRaises(NameError):
+            Interpreter.transform({'a': 'xy'}, 'a $ jtlUnregistered')
+
+    def test_lazyFamilies(self):
+        # In a new interpreter, as other tests already loaded every family
+        script = '''
+import json, sys
+import JTL, JTL.Interpreter
+from JTL import Functions
+heavy = ['argparse', 'ast', 'asyncio', 'base64', 'decimal', 'hashlib', 'hmac', 'inspect', 'logging', 'numpy',
+         'uuid', 'JTL.type_change']
+loaded = [name for name in heavy if name in sys.modules]
+Functions.register('sha1', len)
+result = [loaded, JTL.Interpreter.transform({'a': 'x'}, 'a $ md5'), 'hashlib' in sys.modules,
+          JTL.Interpreter.transform({'a': 'xy'}, 'a $ sha1'), 'toDate' in Functions.functions,
+          'JTL.type_change' in sys.modules]
+print(json.dumps(result))
+'''
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        output = subprocess.check_output([sys.executable, '-c', script], cwd=root)
+        loaded, md5, hashlibLoaded, sha1, hasToDate, typeChangeLoaded = json.loads(output)
+        self.assertEqual(loaded, [])
+        self.assertEqual(md5, '9dd4e461268c8034f5c8564e155c67a6')
+        self.assertTrue(hashlibLoaded)
+        # A registered function is not replaced when its family loads
+        self.assertEqual(sha1, 2)
+        self.assertTrue(hasToDate)
+        self.assertTrue(typeChangeLoaded)
+
 
 if __name__ == "__main__":
     unittest.main()
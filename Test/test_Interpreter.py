@@ -23,8 +23,13 @@ Interpreter unittest
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 
+import asyncio
+import concurrent.futures
+import threading
 import unittest
 
+import JTL
+from JTL import Functions
 from JTL import Interpreter
 from JTL import json_util, type_change
 
@@ -134,6 +139,223 @@ class InterpreterTest(unittest.TestCase):
             self.assertIsNotNone(_result)
             self.assertEqual(Interpreter.transformJson(_json, _config), _result)
 
+    def test_compileTransform(self):
+        compiled = Interpreter.compileTransform('a.X $ + a.Y')
+        self.assertIsInstance(compiled, Interpreter.CompiledExpression)
+        self.assertEqual(compiled.evaluate(self._testData), 5)
+        self.assertEqual(compiled.evaluate({'a': {'X': 10, 'Y': 1}}), 11)
+        self.assertIs(Interpreter.compileTransform('a.X $ + a.Y'), compiled)
+        self.assertRaises(SyntaxError, Interpreter.compileTransform, 'a.X $ ')
+
+    def test_transformCache(self):
+        Interpreter.transformCache.clear()
+        Interpreter.transform(self._testData, 'a.X $ + a.Y')
+        Interpreter.transform(self._testData, 'a.X $ + a.Y')
+        Interpreter.transformJson(self._testData, {'x': 'a.X $ + a.Y', 'y': 'c'})
+        info = Interpreter.transformCache.info()
+        self.assertEqual(info['misses'], 2)
+        self.assertEqual(info['hits'], 2)
+        self.assertEqual(info['size'], 2)
+
+    def test_compileTemplate(self):
+        for test_name in ["faa1", "test1"]:
+            _json = json_util.load_json_file('tests/%s.json' % test_name)
+            _config = json_util.load_json_file('tests/%s.jtl' % test_name)
+            _result = json_util.load_json_file('tests/%s.result' % test_name)
+            compiled = JTL.compile(_config)
+            self.assertIsInstance(compiled, Interpreter.CompiledTransform)
+            self.assertEqual(compiled.apply(_json), _result)
+            self.assertEqual(list(compiled.apply_many([_json, _json])), [_result, _result])
+
+        compiled = JTL.compile({'x': ['a.X', '', ('a $ keys $ sorted', lambda x: ','.join(x))], 'y': 1, 'z': '*'})
+        self.assertEqual(compiled.apply(self._testData), {'x': [3, None, 'X,Y'], 'y': 1, 'z': self._testData})
+        with self.assertRaisesRegex(NameError, '".x.1"'):
+            JTL.compile({'x': ['a.X', 'a $ noSuchOperation']})
+
+    def test_requiredPaths(self):
+        compiled = JTL.compile({'x': ['a.X $ + b', ('c $ length', lambda x: x)], 'y': '$ list 1 2', 'z': 1})
+        self.assertEqual(compiled.required_paths(), {('a', 'X'), ('b',), ('c',)})
+        self.assertEqual(JTL.compile({'x': '* $ list a', 'y': '* $ keys'}).required_paths(), {(), ('a',)})
+        self.assertEqual(JTL.compile({'x': '* $ list a'}).required_paths(), {('a',)})
+        self.assertEqual(JTL.compile({'x': 'a.b $ words $ first', 'y': 'a.b $ words $ last'}).required_paths(),
+                         {('a', 'b')})
+
+    def test_transformJsonBytes(self):
+        for test_name in ["faa1", "test1"]:
+            with open('tests/%s.json' % test_name, 'rb') as f:
+                raw = f.read()
+            _config = json_util.load_json_file('tests/%s.jtl' % test_name)
+            _result = json_util.load_json_file('tests/%s.result' % test_name)
+            self.assertEqual(Interpreter.transformJsonBytes(raw, _config), _result)
+            self.assertEqual(Interpreter.transformJsonBytes(raw, JTL.compile(_config)), _result)
+
+    def test_transformMany(self):
+        records = ({'a': n, 'b': [n, n + 1]} for n in range(5))
+        results = Interpreter.transformMany(records, {'x': 'a $ * 2', 'y': 'b $ sum'})
+        self.assertEqual(next(results), {'x': 0, 'y': 1})
+        self.assertEqual(list(results), [{'x': 2 * n, 'y': 2 * n + 1} for n in range(1, 5)])
+
+        compiled = JTL.compile('a')
+        self.assertEqual(list(Interpreter.transformChunks(({'a': n} for n in range(5)), compiled, 2)),
+                         [[0, 1], [2, 3], [4]])
+        self.assertEqual(list(Interpreter.transformChunks([], compiled, 2)), [])
+        with self.assertRaises(ValueError):
+            next(Interpreter.transformChunks([], compiled, 0))
+
+    def test_ioBoundExecutor(self):
+        threads = set()
+        # Both lookups of a record wait for each other: they fail unless they run at the same time
+        barrier = threading.Barrier(2, timeout=5)
+
+        @Functions.ioBound
+        def lookup(value, suffix=''):
+            threads.add(threading.current_thread().name)
+            barrier.wait()
+            return '%s%s' % (value, suffix)
+
+        template = {'x': ('a.X', lookup), 'y': [('a.Y', lookup, {'suffix': '!'}), 'c'], 'z': ('b', lambda b: len(b))}
+        with concurrent.futures.ThreadPoolExecutor(max_workers=8) as executor:
+            result = Interpreter.transformJson(self._testData, template, executor=executor)
+            self.assertNotIn(threading.current_thread().name, threads)
+            self.assertEqual(result, {'x': '3', 'y': ['2!', 'asdf'], 'z': 1})
+
+            records = [{'a': {'X': n, 'Y': n}, 'b': 'xy', 'c': n} for n in range(8)]
+            results = list(Interpreter.transformMany(iter(records), template, executor=executor, window=4))
+            self.assertEqual(results, [{'x': str(n), 'y': ['%s!' % n, n], 'z': 2} for n in range(8)])
+
+            # The lookup of the first record waits for the one of the fourth: the records of a window overlap
+            started = [threading.Event() for _ in range(8)]
+
+            @Functions.ioBound
+            def waitFor(n):
+                started[n].set()
+                if n == 0 and not started[3].wait(5):
+                    raise AssertionError('the records of a window did not run at the same time')
+                return n
+
+            results = list(Interpreter.transformMany(iter(records), {'x': ('a.X', waitFor)}, executor=executor,
+                                                     window=4))
+            self.assertEqual(results, [{'x': n} for n in range(8)])
+
+            compiled = JTL.compile(('a.X', lookup)).with_executor(executor)
+            barrier = threading.Barrier(1)
+            self.assertEqual(compiled.apply(self._testData), '3')
+            self.assertEqual(Interpreter.transformJson(self._testData, template), result)
+
+    def test_cachedTemplate(self):
+        template = {'x': 'a.X $ + 1', 'y': ['c', 1], 'z': ('b', len)}
+        compiled = Interpreter.cachedTemplate(template)
+        self.assertIs(Interpreter.cachedTemplate({'x': 'a.X $ + 1', 'y': ['c', 1], 'z': ('b', len)}), compiled)
+        self.assertIs(Interpreter.cachedTemplate(compiled), compiled)
+        self.assertIsNot(Interpreter.cachedTemplate({'x': 'a.X $ + 1', 'y': ['c', True], 'z': ('b', len)}), compiled)
+        self.assertEqual(Interpreter.cachedTemplate({'x': 'a.X $ + 1', 'y': ['c', True], 'z': ('b', len)}).apply(
+            self._testData)['y'], ['asdf', True])
+        # Templates changed in place are compiled again
+        template['x'] = 'a.Y'
+        self.assertIsNot(Interpreter.cachedTemplate(template), compiled)
+        self.assertEqual(Interpreter.transformJson(self._testData, compiled), {'x': 4, 'y': ['asdf', 1], 'z': 1})
+        # Unhashable constants are compiled each time
+        self.assertEqual(Interpreter.cachedTemplate({'x': {1, 2}}).apply({}), {'x': {1, 2}})
+
+        # Bound to an executor once per template, executor and window
+        with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
+            bound = Interpreter.cachedTemplate(template, executor)
+            self.assertIsNot(bound, Interpreter.cachedTemplate(template))
+            self.assertIs(Interpreter.cachedTemplate(dict(template), executor), bound)
+            self.assertIsNot(Interpreter.cachedTemplate(template, executor, 4), bound)
+            self.assertIs(Interpreter.cachedTemplate(compiled, executor), Interpreter.cachedTemplate(compiled, executor))
+            self.assertEqual(Interpreter.transformJson(self._testData, template, executor=executor),
+                             {'x': 2, 'y': ['asdf', 1], 'z': 1})
+
+    def test_transformAsync(self):
+        calls = []
+        state = {}
+
+        async def enter():
+            # With a gate, every call waits until the gate count of calls started: they fail unless they overlap
+            state['active'] += 1
+            state['peak'] = max(state['peak'], state['active'])
+            state['started'] += 1
+            if state['gate']:
+                if state['started'] >= state['gate']:
+                    state['event'].set()
+                await asyncio.wait_for(state['event'].wait(), 5)
+            else:
+                await asyncio.sleep(0)
+            state['active'] -= 1
+
+        async def double(x):
+            calls.append(x)
+            await enter()
+            return 2 * x
+
+        async def describe(value, prefix=''):
+            await enter()
+            return '%s%s' % (prefix, value)
+
+        async def run(template, concurrency=None, gate=0):
+            state.update(active=0, peak=0, started=0, gate=gate, event=asyncio.Event())
+            return await Interpreter.transformJsonAsync(self._testData, template, concurrency=concurrency)
+
+        Functions.register('jtlAsyncDouble', double, pure=True)
+        try:
+            template = {'x': 'a.X $ jtlAsyncDouble $ + 1', 'y': ['a.X $ jtlAsyncDouble $ - 1', ('a.Y', describe)],
+                        'z': ('c', describe, {'prefix': '>'}), 'w': '$ list 1 $ first $ jtlAsyncDouble'}
+            expected = {'x': 7, 'y': [5, '2'], 'z': '>asdf', 'w': 2}
+
+            # The 4 calls run at the same time
+            self.assertEqual(asyncio.run(run(template, gate=4)), expected)
+            self.assertEqual(state['peak'], 4)
+            # The shared prefix is awaited once
+            self.assertEqual(sorted(calls), [1, 3])
+
+            self.assertEqual(asyncio.run(run(template, concurrency=1)), expected)
+            self.assertEqual(state['started'], 4)
+            self.assertEqual(state['peak'], 1)
+
+            async def records():
+                for n in range(3):
+                    yield {'a': {'X': n, 'Y': n}, 'c': n}
+
+            async def collect(records):
+                return [result async for result in Interpreter.transformManyAsync(records, template, 2)]
+
+            state.update(active=0, peak=0, started=0, gate=0)
+            results = asyncio.run(collect(records()))
+            self.assertEqual(results, [{'x': 2 * n + 1, 'y': [2 * n - 1, str(n)], 'z': '>%s' % n, 'w': 2}
+                                       for n in range(3)])
+            self.assertLessEqual(state['peak'], 2)
+            self.assertEqual(asyncio.run(collect([{'a': {'X': 1}}]))[0]['x'], 3)
+        finally:
+            Functions.unregister('jtlAsyncDouble')
+
+    def test_registerInvalidatesCache(self):
+        Functions.register('jtlTestOperation', lambda x: 1)
+        try:
+            self.assertEqual(Interpreter.transform(self._testData, 'c $ jtlTestOperation'), 1)
+            Functions.register('jtlTestOperation', lambda x: 2)
+            self.assertEqual(Interpreter.transform(self._testData, 'c $ jtlTestOperation'), 2)
+        finally:
+            Functions.unregister('jtlTestOperation')
+        with self.assertRaises(NameError):
+            Interpreter.transform(self._testData, 'c $ jtlTestOperation')
+
+    def test_compiledEnumArguments(self):
+        expression = '''c $ enumChange "{1: 'one', 2: 'two'}"'''
+        first = Interpreter.compileTransform(expression)
+        second = Interpreter.compileTransform('''c $ enumOrKey "{1: 'one', 2: 'two'}"''')
+        # Inline enums are parsed and indexed once per literal
+        table = first.operations[0][3][0]
+        self.assertIsInstance(table, json_util.EnumTable)
+        self.assertIs(second.operations[0][3][0], table)
+        self.assertEqual(Interpreter.transform({'c': '2'}, expression), 'two')
+        self.assertEqual(Interpreter.transform({'c': 3}, '''c $ enumOrKey "{1: 'one', 2: 'two'}"'''), 3)
+        self.assertEqual(len(table), 2)
+        # Invalid enums still fail when evaluated
+        invalid = Interpreter.compileTransform('c $ enumChange "[1]"')
+        with self.assertRaises(AssertionError):
+            invalid.evaluate({'c': 1})
+
     def test_my(self):
         data = {
             "weather": {
@@ -0,0 +1,156 @@
+# -*- coding:utf-8 -*-
+"""
+Optimizer unittest
+"""
+
+# Copyright (c) 2015-2021 Agalmic Ventures LLC (www.agalmicventures.com)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import unittest
+
+from JTL import Functions
+from JTL import Interpreter
+from JTL import Optimizer
+from JTL import json_util
+
+
+class OptimizerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.calls = []
+
+        def countedWords(s):
+            self.calls.append(s)
+            return s.split(' ')
+
+        Functions.register_maybe('countedWords', countedWords, pure=True)
+        self.addCleanup(Functions.unregister, 'countedWords')
+        Functions.register_maybe('impureWords', countedWords)
+        self.addCleanup(Functions.unregister, 'impureWords')
+        self._testData = {'weather': {'temp': '66.0 F (18.9 C)'}, 'b': 'x y'}
+
+    def test_eliminateCommonSubexpressions(self):
+        template = {
+            'first': 'weather.temp $ countedWords $ first',
+            'last': 'weather.temp $ countedWords $ last',
+            'inner': {'length': ['weather.temp $ countedWords $ length']},
+            'other': 'b $ countedWords $ first',
+            'function': ('.weather.temp $ countedWords', lambda x: x[1]),
+        }
+        expected = {'first': '66.0', 'last': 'C)', 'inner': {'length': [4]}, 'other': 'x', 'function': 'F'}
+
+        compiled = Interpreter.compileTemplate(template)
+        self.assertEqual(compiled.slots, 1)
+        self.assertEqual(compiled.apply(self._testData), expected)
+        self.assertEqual(len(self.calls), 2)
+
+        self.calls = []
+        self.assertEqual(list(compiled.apply_many([self._testData, self._testData])), [expected, expected])
+        self.assertEqual(len(self.calls), 4)
+
+        self.calls = []
+        self.assertEqual(Interpreter.compileTemplate(template, optimize=False).apply(self._testData), expected)
+        self.assertEqual(len(self.calls), 5)
+
+    def test_nestedPrefixes(self):
+        template = {
+            'a': 'weather.temp $ countedWords $ rmFirst $ first',
+            'b': 'weather.temp $ countedWords $ rmFirst $ last',
+            'c': 'weather.temp $ countedWords $ length',
+        }
+        compiled = Interpreter.compileTemplate(template)
+        self.assertEqual(compiled.slots, 2)
+        self.assertEqual(compiled.apply(self._testData), {'a': 'F', 'b': 'C)', 'c': 4})
+        self.assertEqual(len(self.calls), 1)
+
+    def test_sharedValuesNotAliased(self):
+        def appendQ(words):
+            words.append('Q')
+            return words
+
+        template = {'w': 'b $ countedWords', 'n': ('b $ countedWords', appendQ), 'v': 'b $ countedWords'}
+        compiled = Interpreter.compileTemplate(template)
+        self.assertEqual(compiled.slots, 1)
+        result = compiled.apply(self._testData)
+        self.assertEqual(result, {'w': ['x', 'y'], 'n': ['x', 'y', 'Q'], 'v': ['x', 'y']})
+        self.assertEqual(result, Interpreter.transformJson(self._testData, template))
+        self.assertIsNot(result['w'], result['v'])
+
+        template = {'a': 'b $ countedWords $ rmLast', 'b': 'b $ countedWords $ length', 'c': 'b $ countedWords'}
+        result = Interpreter.compileTemplate(template).apply(self._testData)
+        self.assertEqual(result, {'a': ['x'], 'b': 2, 'c': ['x', 'y']})
+        result['a'].append('z')
+        self.assertEqual(result['c'], ['x', 'y'])
+
+    def test_impureNotShared(self):
+        template = {'first': 'weather.temp $ impureWords $ first', 'last': 'weather.temp $ impureWords $ last'}
+        compiled = Interpreter.compileTemplate(template)
+        self.assertEqual(compiled.slots, 0)
+        self.assertEqual(compiled.apply(self._testData), {'first': '66.0', 'last': 'C)'})
+        self.assertEqual(len(self.calls), 2)
+        self.assertFalse(Optimizer.isPureOperation('impureWords'))
+        self.assertTrue(Optimizer.isPureOperation('words'))
+        self.assertTrue(Optimizer.isPureOperation('.a.b'))
+
+    def test_foldConstants(self):
+        expression = Interpreter.compileTransform('* $ list 1 2 3 $ join "-"')
+        self.assertIsInstance(expression.selector, Optimizer.FoldedValue)
+        self.assertEqual(expression.operations, [])
+        self.assertEqual(expression.evaluate(self._testData), '1-2-3')
+
+        expression = Interpreter.compileTransform('$ list 2 $ first $ + 3 $ * 4 $ + b')
+        self.assertEqual(expression.selector.value, 20)
+        self.assertEqual(len(expression.operations), 1)
+        self.assertEqual(expression.evaluate({'b': 1}), 21)
+
+        self.assertEqual(Interpreter.compileTransform('$ null $ default 5').selector.value, 5)
+        self.assertEqual(Interpreter.compileTransform('$ list "m" $ first $ hmac_md5 "k"').operations, [])
+
+        # results are copied for each record
+        expression = Interpreter.compileTransform('$ list 1 2')
+        result = expression.evaluate({})
+        result.append(3)
+        self.assertEqual(expression.evaluate({}), [1, 2])
+
+    def test_foldConstantsSkipped(self):
+        # depends on the record
+        self.assertNotIsInstance(Interpreter.compileTransform('b $ + 1').selector, Optimizer.FoldedValue)
+        self.assertNotIsInstance(Interpreter.compileTransform('$ list b 2').selector, Optimizer.FoldedValue)
+        # impure
+        expression = Interpreter.compileTransform('$ list "a b" $ first $ impureWords')
+        self.assertEqual(len(expression.operations), 1)
+        self.assertEqual(expression.evaluate({}), ['a', 'b'])
+        self.assertEqual(len(self.calls), 1)
+        # errors are left to each record
+        expression = Interpreter.compileTransform('$ list 1 $ first $ / 0')
+        self.assertEqual(len(expression.operations), 1)
+        self.assertRaises(ZeroDivisionError, expression.evaluate, {})
+
+    def test_sameResults(self):
+        for test_name in ["faa1", "test1"]:
+            _json = json_util.load_json_file('tests/%s.json' % test_name)
+            _config = json_util.load_json_file('tests/%s.jtl' % test_name)
+            _result = json_util.load_json_file('tests/%s.result' % test_name)
+            compiled = Interpreter.compileTemplate(_config)
+            self.assertEqual(compiled.apply(_json), _result)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,139 @@
+# -*- coding:utf-8 -*-
+"""
+Parallel unittest
+"""
+
+# Copyright (c) 2015-2021 Agalmic Ventures LLC (www.agalmicventures.com)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import io
+import multiprocessing
+import os
+import shutil
+import tempfile
+import unittest
+
+import JTL
+from JTL import Functions
+from JTL import Interpreter
+from JTL import Parallel
+from JTL import enum_store
+from JTL import json_util
+
+
+def triple(x):
+    return 3 * x
+
+
+def exitWorker(x):
+    os._exit(3)
+
+
+def enumKind(record, fileName):
+    return type(json_util.BIG_ENUM_JSON.get(fileName)).__name__
+
+
+class ParallelTest(unittest.TestCase):
+
+    def setUp(self):
+        self.records = [{'a': n, 'b': {'c': str(n)}} for n in range(50)]
+        self.expected = [{'x': n + 1, 'y': str(n)} for n in range(50)]
+
+    def test_transformMany(self):
+        template = {'x': 'a $ + 1', 'y': 'b.c'}
+        results = Interpreter.transformMany(iter(self.records), template, workers=2, chunksize=7)
+        self.assertEqual(list(results), self.expected)
+
+        results = Parallel.transformMany(self.records, template, 3, chunksize=4, ordered=False)
+        self.assertEqual(sorted(results, key=lambda r: r['x']), self.expected)
+
+    def test_transformChunks(self):
+        chunks = list(Interpreter.transformChunks(self.records, Interpreter.compileTemplate('a'), 20, workers=2))
+        self.assertEqual(chunks, [list(range(20)), list(range(20, 40)), list(range(40, 50))])
+
+    def test_registeredFunctions(self):
+        Functions.register_maybe('jtlParallelTriple', triple, pure=True)
+        try:
+            # Inherited by forked workers, registered again by spawned ones
+            for method in ('fork', 'spawn'):
+                context = multiprocessing.get_context(method)
+                results = Parallel.transformMany(self.records[:5], 'a $ jtlParallelTriple', 2, context=context)
+                self.assertEqual(list(results), [0, 3, 6, 9, 12])
+        finally:
+            Functions.unregister('jtlParallelTriple')
+
+    def test_sharedEnums(self):
+        directory = tempfile.mkdtemp()
+        fileName = os.path.join(directory, 'enum.json')
+        with open(fileName, 'w', encoding='utf-8') as f:
+            f.write('{"1": "one", "2": "two"}')
+        Functions.register('jtlEnumKind', enumKind)
+        try:
+            json_util.BIG_ENUM_JSON.preload([fileName])
+            template = {'x': 'a $ enumFileChange "%s"' % fileName, 'kind': '* $ jtlEnumKind "%s"' % fileName}
+            for method in ('fork', 'spawn'):
+                context = multiprocessing.get_context(method)
+                results = list(Parallel.transformMany(self.records[:3], template, 2, context=context))
+                # The workers read the compact file mapped by the parent process, spawned ones too
+                self.assertEqual(results, [{'x': x, 'kind': 'MappedEnum'} for x in (None, 'one', 'two')])
+        finally:
+            Functions.unregister('jtlEnumKind')
+            json_util.BIG_ENUM_JSON.clear()
+            os.remove(enum_store.mapped_file_path(fileName))
+            shutil.rmtree(directory)
+
+    def test_errors(self):
+        with self.assertRaises(ValueError):
+            next(Parallel.transformMany(self.records, 'a', 0))
+        with self.assertRaises(NameError):
+            next(Parallel.transformMany(self.records, 'a $ noSuchOperation', 2))
+
+    def test_transformLines(self):
+        lines = [b'{"a": %d, "b": {"c": "%d"}}\n' % (n, n) for n in range(50)] + [b'\n']
+        template = {'x': 'a $ + 1', 'y': 'b.c'}
+        expected = io.StringIO()
+        JTL.runLines(lines, Interpreter.compileTemplate(template), expected)
+        for batchsize in (1, 7, 100):
+            output = io.StringIO()
+            Parallel.transformLines(iter(lines), template, 3, output, batchsize=batchsize, project=True)
+            self.assertEqual(output.getvalue(), expected.getvalue())
+        self.assertEqual(expected.getvalue().splitlines()[3], '{"x":4,"y":"3"}')
+        projected = io.StringIO()
+        JTL.runLines(lines, Interpreter.compileTemplate(template), projected, project=True)
+        self.assertEqual(projected.getvalue(), expected.getvalue())
+
+        with self.assertRaisesRegex(RuntimeError, 'ZeroDivisionError'):
+            Parallel.transformLines(lines, {'x': 'a $ / 0'}, 2, io.StringIO(), batchsize=5)
+
+        # A worker killed without sending its results
+        with self.assertRaisesRegex(RuntimeError, 'exited without finishing'):
+            Parallel.transformLines(iter(lines), {'x': ('a', exitWorker)}, 2, io.StringIO(), batchsize=5)
+
+        # Malformed records are reported with their line number instead of giving results full of nulls
+        lines[12] = b'{"a": 12, "b": \n'
+        with self.assertRaisesRegex(ValueError, 'line 13'):
+            JTL.runLines(lines, Interpreter.compileTemplate(template), io.StringIO())
+        for batchsize in (1, 5):
+            with self.assertRaisesRegex(RuntimeError, 'invalid JSON record on line 13'):
+                Parallel.transformLines(iter(lines), template, 2, io.StringIO(), batchsize=batchsize)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,108 @@
+# -*- coding:utf-8 -*-
+"""
+Parser unittest
+"""
+
+# Copyright (c) 2015-2021 Agalmic Ventures LLC (www.agalmicventures.com)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import random
+import shlex
+import unittest
+
+from JTL import Parser
+
+
+def shlexTokenize(transform):
+    """The tokenizer JTL used to be built on, kept as the reference for Parser.tokenize"""
+    lexer = shlex.shlex(transform, posix=False)
+    lexer.wordchars += '.+-*=<>!'
+    return list(lexer)
+
+
+class ParserTest(unittest.TestCase):
+
+    EXPRESSIONS = [
+        '',
+        '*',
+        'a.X',
+        'a $ .X $ toString',
+        'a.X$+a.Y',
+        '$ list c b.p.d.q "h" $ join "-"',
+        '''a.Y $ enumChange "{1: 'one', '2': 'two'}"''',
+        """not_name $ default "{'a': 22}" """,
+        "list $ join '-'",
+        '* $ list INTENTION_PLACE, INTENTION_PLACE_ONE, INTENTION_PLACE_TWO $ rmNull $ first',
+        'Z $ toFloat $ + -1.2e3 $ ** 2 $ >= 3 $ != 4',
+        'e $ hmac_sha1 Z',
+        '名字 $ 馬 "大哈"',
+        'a"b c"',
+        '"ab"cd',
+        "'a b' \"c'd\"",
+        'a\tb\r\nc\x0bd',
+        'ab#c\nde',
+        'ab #c\nde',
+        '"x"#c\nde',
+        'ab#c\n"x y"',
+        '#only',
+        'a $ b # trailing comment',
+    ]
+
+    def test_tokenize_conformance(self):
+        for expression in self.EXPRESSIONS:
+            self.assertEqual(Parser.tokenize(expression), shlexTokenize(expression), expression)
+
+    def test_tokenize_random(self):
+        alphabet = 'ab.+$ \t\n"\'#,{}:1_馬'
+        generator = random.Random(20211)
+        for _ in range(5000):
+            expression = ''.join(generator.choice(alphabet) for _ in range(generator.randint(0, 12)))
+            try:
+                expected = shlexTokenize(expression)
+            except ValueError:
+                self.assertRaises(ValueError, Parser.tokenize, expression)
+                continue
+            self.assertEqual(Parser.tokenize(expression), expected, repr(expression))
+
+    def test_tokenize_unclosed(self):
+        self.assertRaises(ValueError, Parser.tokenize, 'a $ join "-')
+        self.assertRaises(ValueError, Parser.tokenize, "a $ join '- # comment")
+
+    def test_parseTransform(self):
+        self.assertEqual(Parser.parseTransform(''), [[]])
+        self.assertEqual(Parser.parseTransform('a.X'), [['a.X']])
+        self.assertEqual(Parser.parseTransform('$ list a.X "$"'), [[], ['list', 'a.X', '"$"']])
+        self.assertEqual(Parser.parseTransform('a $ words$first'), [['a'], ['words'], ['first']])
+
+    def test_compileArgument(self):
+        for token, value in [('1', 1), ('-2.5', -2.5), ('"h"', 'h'), ("'h'", 'h'), ('false', False), ('True', True),
+                             ('', ''), (None, None)]:
+            argument = Parser.compileArgument(token)
+            self.assertIsInstance(argument, Parser.Constant, token)
+            self.assertEqual(argument.resolve({}), value)
+
+        argument = Parser.compileArgument('weather.temp')
+        self.assertIsInstance(argument, Parser.PathArgument)
+        self.assertEqual(argument.resolve({'weather': {'temp': 66}}), 66)
+        self.assertEqual(argument.resolve({}), None)
+
+
+if __name__ == "__main__":
+    unittest.main()
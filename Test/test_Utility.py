@@ -54,6 +54,36 @@ class UtilityTest(unittest.TestCase):
         self.assertEqual(Utility.extractSplitPath(self._testData, ['b', 'p', 'd', 'q']), 'test')
         self.assertEqual(Utility.extractSplitPath(self._testData, ['c']), 'asdf')
 
+    def test_extractPathEdges(self):
+        self.assertEqual(Utility.extractPath(self._testData, ''), self._testData)
+        self.assertEqual(Utility.extractPath(self._testData, '.'), self._testData)
+        self.assertEqual(Utility.extractPath(self._testData, '.a.X'), 3)
+        self.assertEqual(Utility.extractPath(self._testData, 'c.d'), None)
+        self.assertEqual(Utility.extractPath(self._testData, 'a.X.Y'), None)
+        self.assertEqual(Utility.extractPath(None, 'a'), None)
+
+    def test_compilePath(self):
+        compiled = Utility.compilePath('b.p.d.q')
+        self.assertEqual(compiled.keys, ('b', 'p', 'd', 'q'))
+        self.assertEqual(compiled.get(self._testData), 'test')
+        self.assertEqual(compiled.get({'b': {'p': 'x'}}), None)
+        self.assertEqual(compiled.get([]), None)
+        self.assertIs(Utility.compilePath('b.p.d.q'), compiled)
+
+    def test_LRUCache(self):
+        cache = Utility.LRUCache(2)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        self.assertEqual(cache.get('a'), 1)
+        cache.put('c', 3)
+        self.assertEqual(cache.get('b'), None)
+        self.assertEqual(cache.get('a'), 1)
+        self.assertEqual(cache.get('c'), 3)
+        self.assertEqual(cache.info(), {'hits': 3, 'misses': 1, 'evictions': 1, 'size': 2, 'maxsize': 2})
+        cache.clear()
+        self.assertEqual(len(cache), 0)
+        self.assertEqual(cache.info()['hits'], 0)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,143 @@
+# -*- coding:utf-8 -*-
+"""
+enum store unittest
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from JTL import Interpreter, enum_store, json_util
+
+
+class TestEnumStore(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.file_name = os.path.join(self.directory, 'enum.sqlite')
+
+    def tearDown(self):
+        json_util.BIG_ENUM_JSON.clear()
+        shutil.rmtree(self.directory)
+
+    def test_lookups(self):
+        """EnumStore finds what EnumTable finds"""
+        enum = {1: '一', '2': '二', '-3': '负三', 'x': ['list'], '哈': {'a': 1}}
+        self.assertEqual(enum_store.build_enum_store(enum, self.file_name), 5)
+        store = enum_store.EnumStore(self.file_name, hot_size=2)
+        table = json_util.EnumTable(enum)
+        with self.assertRaises(TypeError):
+            enum_store.DiskEnum()
+        self.assertEqual(len(store), 5)
+        for _ in range(2):
+            for key in (1, '1', 2, '2', -3, '-3', 'x', '哈', True, 5, '5', '一', None):
+                self.assertEqual(store.change(key), table.change(key), key)
+                self.assertEqual(store.get(key, key), table.get(key, key), key)
+        self.assertTrue(store.has_value(['list']))
+        self.assertFalse(store.has_value(['other']))
+        store.close()
+        self.assertEqual(store.get('2'), '二')
+
+    def test_enum_file_change(self):
+        """enumFileChange reads the store files, and reloads them when they are rebuilt"""
+        enum_store.build_enum_store(((str(i), 'v%d' % i) for i in range(1000)), self.file_name)
+        self.assertEqual(json_util.enum_file_change('5', self.file_name), 'v5')
+        self.assertEqual(json_util.enum_file_change(999, self.file_name), 'v999')
+        self.assertEqual(json_util.enum_file_change('v7', self.file_name), 'v7')
+        self.assertEqual(json_util.enum_file_change('1000', self.file_name), None)
+        self.assertIsInstance(json_util.BIG_ENUM_JSON.get(self.file_name), enum_store.EnumStore)
+        self.assertEqual(Interpreter.transform({'a': 3}, 'a $ enumFileChange "%s"' % self.file_name), 'v3')
+
+        json_util.BIG_ENUM_JSON.check_interval = 0
+        try:
+            enum_store.build_enum_store({'5': 'five'}, self.file_name)
+            self.assertEqual(json_util.enum_file_change('5', self.file_name), 'five')
+            self.assertEqual(json_util.enum_file_change('6', self.file_name), None)
+        finally:
+            json_util.BIG_ENUM_JSON.check_interval = json_util.ENUM_FILE_CHECK_INTERVAL
+
+    def test_mapped_enum(self):
+        """MappedEnum finds what EnumTable finds"""
+        enum = {1: '一', '2': '二', '-3': '负三', 'x': ['list'], '哈': {'a': 1}}
+        enum.update(('k%d' % i, i % 7) for i in range(100))
+        file_name = os.path.join(self.directory, 'enum.jtlenum')
+        self.assertEqual(enum_store.build_mapped_enum(enum, file_name, (1, 2)), len(enum))
+        mapped = enum_store.MappedEnum(file_name, hot_size=2)
+        table = json_util.EnumTable(enum)
+        self.assertEqual(len(mapped), len(enum))
+        self.assertEqual(mapped.source_stat, (1, 2))
+        for key in list(enum) + [1, 2, -3, True, 5, '5', '一', 3, 'k100', None]:
+            self.assertEqual(mapped.change(key), table.change(key), key)
+        self.assertTrue(mapped.has_value(['list']))
+        self.assertFalse(mapped.has_value(7))
+
+        with open(file_name, 'wb') as file:
+            file.write(b'not an enum' * 10)
+        with self.assertRaises(ValueError):
+            enum_store.MappedEnum(file_name)
+
+    def test_preload(self):
+        """preloaded enum files are read from a shared compact file, rebuilt when the enum file changes"""
+        enum_store.MAPPED_DIRECTORY = os.path.join(self.directory, 'mapped')
+        file_name = os.path.join(self.directory, 'enum.json')
+        try:
+            with open(file_name, 'w', encoding='utf-8') as file:
+                file.write('{"1": "one", "2": "two"}')
+            json_util.BIG_ENUM_JSON.preload([file_name])
+            self.assertIsInstance(json_util.BIG_ENUM_JSON.get(file_name), enum_store.MappedEnum)
+            self.assertTrue(os.path.exists(enum_store.mapped_file_path(file_name)))
+            self.assertEqual(json_util.enum_file_change(2, file_name), 'two')
+            self.assertEqual(json_util.enum_file_change('one', file_name), 'one')
+
+            json_util.BIG_ENUM_JSON.check_interval = 0
+            with open(file_name, 'w', encoding='utf-8') as file:
+                file.write('{"1": "uno"}')
+            self.assertEqual(json_util.enum_file_change(1, file_name), 'uno')
+            self.assertEqual(json_util.enum_file_change(2, file_name), None)
+        finally:
+            json_util.BIG_ENUM_JSON.check_interval = json_util.ENUM_FILE_CHECK_INTERVAL
+            enum_store.MAPPED_DIRECTORY = None
+
+    def test_private_directory(self):
+        """the compact files are only built and trusted in a directory private to the user"""
+        self.assertNotEqual(enum_store.mapped_directory(), os.path.join(tempfile.gettempdir(), 'jtl-enums'))
+        directory = os.path.join(self.directory, 'mapped')
+        enum_store.private_directory(directory)
+        self.assertEqual(os.stat(directory).st_mode & 0o777, 0o700)
+
+        file_name = os.path.join(self.directory, 'enum.json')
+        with open(file_name, 'w', encoding='utf-8') as file:
+            file.write('{"1": "one"}')
+        stat = (os.stat(file_name).st_mtime_ns, os.stat(file_name).st_size)
+        enum_store.MAPPED_DIRECTORY = directory
+        try:
+            os.chmod(directory, 0o777)
+            with self.assertRaises(PermissionError):
+                enum_store.private_directory(directory)
+            with self.assertLogs(level='WARNING'):
+                self.assertEqual(enum_store.mapped_enum(file_name, stat, json_util.load_json_file), {'1': 'one'})
+            self.assertFalse(os.listdir(directory))
+
+            os.chmod(directory, 0o700)
+            self.assertIsInstance(enum_store.mapped_enum(file_name, stat, json_util.load_json_file),
+                                  enum_store.MappedEnum)
+        finally:
+            enum_store.MAPPED_DIRECTORY = None
+
+        link = os.path.join(self.directory, 'link')
+        os.symlink(directory, link)
+        with self.assertRaises(PermissionError):
+            enum_store.private_directory(link)
+
+    def test_invalid_file(self):
+        """a file which is not a store fails"""
+        with open(self.file_name, 'w') as file:
+            file.write('{"a": 1}')
+        with self.assertRaises(Exception):
+            enum_store.EnumStore(self.file_name)
+        self.assertEqual(os.listdir(self.directory), ['enum.sqlite'])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,84 @@
+# -*- coding:utf-8 -*-
+"""
+json codec unittest
+"""
+
+import os
+import uuid
+import time
+import decimal
+import datetime
+import unittest
+
+from JTL import json_codec
+
+
+def installed_codecs():
+    codecs = []
+    for name in json_codec.BACKENDS:
+        try:
+            codecs.append(json_codec.CODECS[name]())
+        except ImportError:
+            pass
+    return codecs
+
+
+class TestJsonCodec(unittest.TestCase):
+
+    def setUp(self):
+        self.environment = os.environ.pop(json_codec.ENV_VARIABLE, None)
+
+    def tearDown(self):
+        if self.environment is not None:
+            os.environ[json_codec.ENV_VARIABLE] = self.environment
+        json_codec.set_backend()
+
+    def test_same_results(self):
+        values = [
+            {'a': 1, 'b': [1.5, None, True, '哈哈 a/b']},
+            {'time': datetime.datetime(2020, 1, 2, 3, 4, 5, 6, tzinfo=datetime.timezone.utc),
+             'date': datetime.date(2020, 1, 2), 'clock': datetime.time(3, 4, 5)},
+            [decimal.Decimal('1.25'), uuid.UUID(int=5), b'abc', {1}, time.gmtime(0)],
+            {'z': {'id': uuid.UUID(int=1)}, 'a': 2 ** 70},
+            {2: 'two', 1: 'one'},
+        ]
+        reference = json_codec.JsonCodec()
+        for codec in installed_codecs():
+            for value in values:
+                for indent in (None, 2):
+                    for sort_keys in (False, True):
+                        for ensure_ascii in (False, True):
+                            self.assertEqual(codec.dumps(value, indent, sort_keys, ensure_ascii),
+                                             reference.dumps(value, indent, sort_keys, ensure_ascii), (codec.name, value))
+            self.assertEqual(codec.dumps(['哈', '😀']), '["\\u54c8","\\ud83d\\ude00"]')
+            self.assertEqual(codec.dumps(['哈'], ensure_ascii=False), '["哈"]')
+            self.assertEqual(codec.dumps({'b': 1, 'a': [2]}, sort_keys=True), '{"a":[2],"b":1}')
+            for text in ('{"a": [1, 2.5, null, "哈"]}', b'{"a": {"b": true}}', '[NaN, Infinity]'):
+                self.assertEqual(codec.loads(text), reference.loads(text), codec.name)
+            with self.assertRaises(ValueError):
+                codec.loads('{1: 2}')
+
+    def test_set_backend(self):
+        self.assertEqual(json_codec.set_backend('json').name, 'json')
+        self.assertEqual(json_codec.dumps({'a': [1]}), '{"a":[1]}')
+        self.assertEqual(json_codec.loads('{"a": [1]}'), {'a': [1]})
+
+        # the json module by default, even when a faster backend is installed
+        self.assertEqual(json_codec.set_backend().name, 'json')
+        self.assertEqual(json_codec.loads('{"id": 123456789012345678901}'), {'id': 123456789012345678901})
+        self.assertEqual(json_codec.dumps(float('nan')), 'NaN')
+
+        for codec in installed_codecs():
+            os.environ[json_codec.ENV_VARIABLE] = codec.name
+            try:
+                self.assertEqual(json_codec.set_backend().name, codec.name)
+            finally:
+                del os.environ[json_codec.ENV_VARIABLE]
+
+        self.assertEqual(json_codec.set_backend('auto').name, installed_codecs()[0].name)
+        with self.assertRaises(ValueError):
+            json_codec.set_backend('yaml')
+
+
+if __name__ == "__main__":
+    unittest.main()
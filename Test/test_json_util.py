@@ -3,11 +3,13 @@
 json Utility unittest
 """
 
+import io
 import os
 import uuid
 import time
 import decimal
 import datetime
+import json
 import unittest
 
 from JTL import json_util
@@ -84,6 +86,7 @@ class TestJsonUtil(unittest.TestCase):
         content = '''{ "0": "未婚", "1": "已婚", "2": "离异", 4: "丧偶",}'''
         with open(os.path.join(os.getcwd(), file_name), 'w', encoding='utf-8') as file:
             file.write(content)
+        json_util.BIG_ENUM_JSON.clear()
 
         self.assertEqual(json_util.enum_file_change('2', file_name), '离异')
         self.assertEqual(len(json_util.BIG_ENUM_JSON), 1)
@@ -94,19 +97,55 @@ class TestJsonUtil(unittest.TestCase):
         self.assertEqual(len(json_util.BIG_ENUM_JSON), 1)
         enum_dict2 = json_util.BIG_ENUM_JSON.get(file_name)
         self.assertEqual(id(enum_dict), id(enum_dict2))
-        self.assertEqual(enum_dict2.get(1), '已婚')
+        # the table is not changed by the lookups
+        self.assertEqual(enum_dict2.get(1), None)
 
-        self.assertEqual(enum_dict.get("未婚"), None)
         self.assertEqual(json_util.enum_file_change("未婚", file_name), "未婚")
-        enum_dict2 = json_util.BIG_ENUM_JSON.get(file_name)
-        self.assertEqual(id(enum_dict), id(enum_dict2))
-        self.assertEqual(enum_dict2.get("未婚"), "未婚")
+        self.assertEqual(json_util.enum_file_change("未婚", file_name), "未婚")
+        self.assertEqual(enum_dict.get("未婚"), None)
 
         self.assertEqual(json_util.enum_file_change("4", file_name), "丧偶")
         self.assertEqual(json_util.enum_file_change(5, file_name), None)
         self.assertEqual(json_util.enum_file_change('10', file_name), None)
+        self.assertEqual(len(enum_dict), 4)
+        info = json_util.BIG_ENUM_JSON.info()
+        self.assertEqual((info['hits'], info['misses'], info['loads']), (3, 4, 1))
         os.remove(file_name)
 
+    def test_enum_file_cache(self):
+        """EnumFileCache reload and eviction test"""
+        cache = json_util.EnumFileCache(check_interval=0)
+        names = ['_example_enum_%d.json' % i for i in range(3)]
+        try:
+            for i, name in enumerate(names):
+                with open(name, 'w', encoding='utf-8') as file:
+                    file.write('{"a": "%s"}' % i)
+            self.assertEqual(cache.lookup('a', names[0]), '0')
+            self.assertEqual(cache.lookup('x', names[0]), None)
+
+            # reloaded when the file changes
+            with open(names[0], 'w', encoding='utf-8') as file:
+                file.write('{"a": "new", "x": "y"}')
+            self.assertEqual(cache.lookup('a', names[0]), 'new')
+            self.assertEqual(cache.lookup('x', names[0]), 'y')
+            self.assertEqual(cache.info()['reloads'], 1)
+            # the old table is kept while the file is missing
+            os.remove(names[0])
+            self.assertEqual(cache.lookup('a', names[0]), 'new')
+
+            # the least recently used table is dropped over the memory budget
+            cache.max_bytes = cache.info()['bytes'] * 2 + 1
+            self.assertEqual(cache.lookup('a', names[1]), '1')
+            self.assertEqual(cache.lookup('a', names[0]), 'new')
+            self.assertEqual(cache.lookup('a', names[2]), '2')
+            self.assertEqual(len(cache), 2)
+            self.assertNotIn(names[1], cache)
+            self.assertEqual(cache.info()['evictions'], 1)
+        finally:
+            for name in names:
+                if os.path.exists(name):
+                    os.remove(name)
+
     def test_enum_change(self):
         """enum_change tests"""
         self.assertEqual(json_util.enum_change(1, "{1: '一', 2: '二', 3: '三'}"), '一')
@@ -128,6 +167,29 @@ class TestJsonUtil(unittest.TestCase):
         self.assertEqual(json_util.enum_or_key('二', {1: '一', 2: '二', 3: '三'}), '二')
         self.assertEqual(json_util.enum_or_key(5, {'1': '一', '2': '二', '3': '三'}), 5)
         self.assertEqual(json_util.enum_or_key('10', {'1': '一', '2': '二', '3': '三'}), '10')
+        # the enum is not modified
+        enum = {1: '一', '2': '二'}
+        self.assertEqual(json_util.enum_or_key('1', enum), '一')
+        self.assertEqual(json_util.enum_or_key(2, enum), '二')
+        self.assertEqual(json_util.enum_or_key(3, enum), 3)
+        self.assertEqual(enum, {1: '一', '2': '二'})
+
+    def test_enum_table(self):
+        """EnumTable tests"""
+        enum = {1: '一', '2': '二', '-3': '负三', '04': '四', 'x': ['list']}
+        table = json_util.EnumTable(enum)
+        for key in (1, '1', 2, '2', -3, '-3', '04', 4, '4', 'x', True, 1.0, 5, '5', '一', None):
+            self.assertEqual(table.change(key), json_util.enum_change(key, enum), key)
+            self.assertEqual(table.get(key, key), json_util.enum_or_key(key, dict(enum)), key)
+        self.assertTrue(table.has_value(['list']))
+        self.assertEqual(json_util.enum_change('007', {7: 'seven'}), 'seven')
+        self.assertEqual(len(enum), 5)
+
+        # inline enums are indexed once
+        literal = "{1: 'one', 2: 'two'}"
+        self.assertEqual(json_util.enum_change('2', literal), 'two')
+        self.assertIs(json_util.enum_table(literal), json_util.enum_table(literal))
+        self.assertEqual(json_util.enum_or_key(3, json_util.enum_table(literal)), 3)
 
     def test_load_json(self):
         """load_json test"""
@@ -137,6 +199,61 @@ class TestJsonUtil(unittest.TestCase):
         self.assertEqual(json_util.load_json('{"n":None, "aa":[True,"2",False,]}'),
                          {"n": None, "aa": [True, "2", False]})
 
+    def test_load_json_literal(self):
+        """load_json python literal fallback test"""
+        self.assertEqual(json_util.load_json("{1: 'one', 2: 'two'}"), {1: 'one', 2: 'two'})
+        self.assertEqual(json_util.load_json("{'a': true, 'b': [null, false]}"), {'a': True, 'b': [None, False]})
+        self.assertEqual(json_util.load_json("'text'"), 'text')
+        # names and code are not evaluated
+        self.assertEqual(json_util.load_json('value'), None)
+        self.assertEqual(json_util.load_json('os'), None)
+        self.assertEqual(json_util.load_json('__import__("os").getcwd()'), None)
+        # cached literals are copied, so changing a result does not change the next one
+        result = json_util.load_json("{1: 'one'}")
+        result[2] = 'two'
+        self.assertEqual(json_util.load_json("{1: 'one'}"), {1: 'one'})
+        self.assertIn("{1: 'one'}", json_util.LITERAL_CACHE)
+
+    def test_load_json_strict(self):
+        """load_json strict mode test"""
+        self.assertEqual(json_util.load_json('{"a": [1, null]}', strict=True), {'a': [1, None]})
+        self.assertEqual(json_util.load_json("{1: 'one'}", strict=True), None)
+        json_util.STRICT_JSON = True
+        try:
+            self.assertEqual(json_util.load_json("{1: 'one'}"), None)
+            self.assertEqual(json_util.load_json("{1: 'one'}", strict=False), {1: 'one'})
+        finally:
+            json_util.STRICT_JSON = False
+
+    def test_projection(self):
+        """compile_projection / project_json test"""
+        projection = json_util.compile_projection([('a', 'b'), ('a', 'c', 'd'), ('e',), ('e', 'f')])
+        self.assertEqual(projection, {'a': {'b': True, 'c': {'d': True}}, 'e': True})
+        self.assertEqual(json_util.compile_projection([('a',), ()]), None)
+
+        value = {'a': {'b': [1, 2], 'c': 3, 'x': 4}, 'e': {'f': 5, 'g': 6}, 'y': 7}
+        self.assertEqual(json_util.project_json(value, projection), {'a': {'b': [1, 2]}, 'e': {'f': 5, 'g': 6}})
+        self.assertEqual(json_util.project_json(value, None), value)
+        self.assertEqual(json_util.load_json_projection(b'{"a": {"b": 1, "x": 2}, "y": 3}', projection), {'a': {'b': 1}})
+        with self.assertRaises(ValueError):
+            json_util.load_json_projection(b'{"a": ', projection)
+
+    def test_iter_json_array(self):
+        """iter_json_array test"""
+        values = [1, -2.5e10, 1.5e-300, 'a"\\u00e9', u'中文', True, None, [], {}, {'a': [1, {'b': 'c'}], 'd': 12345678901234}]
+        for text in (json.dumps(values), json.dumps(values, indent=2, ensure_ascii=False)):
+            for chunk_size in (1, 2, 3, 7, 1000):
+                self.assertEqual(list(json_util.iter_json_array(io.StringIO(text), chunk_size)), values)
+                stream = io.BytesIO(text.encode('utf-8'))
+                self.assertEqual(list(json_util.iter_json_array(stream, chunk_size)), values)
+        self.assertEqual(list(json_util.iter_json_array(io.StringIO(' [ ] '))), [])
+
+        self.assertEqual(list(json_util.iter_json_array(io.StringIO('[1, 2] \n'), 1)), [1, 2])
+
+        for text in ('{}', '', '[1, 2', '[1 2]', '[1,, 2]', '[1, 2,]', '[tru]', '[1,2]x', '[] []', '[1] ,'):
+            with self.assertRaises(ValueError):
+                list(json_util.iter_json_array(io.StringIO(text), 2))
+
     def test_load_json_file(self):
         """load_json_file 测试"""
 
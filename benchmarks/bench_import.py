@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+"""
+Benchmark of the time taken to import JTL and run a small transformation from the command line, in new interpreters.
+With --max-ms, exits with an error when importing JTL.Interpreter takes longer, to catch startup regressions.
+
+usage: python3 benchmarks/bench_import.py [-n NUMBER] [--max-ms MILLISECONDS]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules only the functions or modes needing them import
+LAZY_MODULES = ['argparse', 'ast', 'asyncio', 'base64', 'decimal', 'hashlib', 'hmac', 'inspect', 'logging', 'numpy',
+                'uuid', 'JTL.type_change']
+
+COMMANDS = [
+    ('python', ['-c', 'pass']),
+    ('import JTL.Interpreter', ['-c', 'import JTL.Interpreter']),
+    ('python3 -m JTL', ['-m', 'JTL', '-s', os.path.join('tests', 'faa1.json'), '{"tempF": "weather.temp"}']),
+]
+
+
+def timeCommand(arguments, number):
+    times = []
+    for _ in range(number):
+        start = time.perf_counter()
+        subprocess.run([sys.executable] + arguments, cwd=ROOT, stdout=subprocess.DEVNULL, check=True)
+        times.append((time.perf_counter() - start) * 1e3)
+    return min(times), statistics.median(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Import time benchmark')
+    parser.add_argument('-n', '--number', default=20, type=int, help='Runs per command.')
+    parser.add_argument('--max-ms', type=float, help='Fail when importing JTL.Interpreter takes longer than python.')
+    arguments = parser.parse_args()
+
+    script = 'import sys, JTL.Interpreter; print(" ".join(m for m in %r if m in sys.modules))' % LAZY_MODULES
+    loaded = subprocess.check_output([sys.executable, '-c', script], cwd=ROOT).decode().split()
+    print('lazy modules loaded by import JTL.Interpreter: %s' % (', '.join(loaded) or 'none'))
+
+    print('%-30s %10s %10s' % ('command', 'min ms', 'median ms'))
+    results = {}
+    for name, command in COMMANDS:
+        results[name] = timeCommand(command, arguments.number)
+        print('%-30s %10.1f %10.1f' % ((name,) + results[name]))
+
+    importMs = results['import JTL.Interpreter'][0] - results['python'][0]
+    print('import JTL.Interpreter: %.1f ms over python' % importMs)
+    if arguments.max_ms is not None and (importMs > arguments.max_ms or loaded):
+        print('Import time regression: %.1f ms > %.1f ms or lazy modules loaded' % (importMs, arguments.max_ms))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
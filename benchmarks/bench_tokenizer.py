@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+"""
+Microbenchmark of Parser.tokenize against the shlex lexer it replaced.
+
+usage: python3 benchmarks/bench_tokenizer.py [-n NUMBER]
+"""
+
+import argparse
+import os
+import shlex
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from JTL import Parser  # noqa: E402
+
+EXPRESSIONS = [
+    'weather.temp',
+    'weather.temp $ words $ 2 $ rmFirst $ toFloat $ + 1.0',
+    '* $ list skill_type compet_level time_use $ join "/"',
+    '''a.Y $ enumChange "{1: 'one', 2: 'two'}"''',
+    'c $ hmac_sha256 secret.key # keyed hash',
+]
+
+
+def shlexTokenize(transform):
+    lexer = shlex.shlex(transform, posix=False)
+    lexer.wordchars += '.+-*=<>!'
+    return list(lexer)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Tokenizer microbenchmark')
+    parser.add_argument('-n', '--number', default=20000, type=int, help='Iterations per expression.')
+    arguments = parser.parse_args()
+
+    print('%-60s %12s %12s %8s' % ('expression', 'shlex us', 'tokenize us', 'speedup'))
+    for expression in EXPRESSIONS:
+        assert Parser.tokenize(expression) == shlexTokenize(expression)
+        old = timeit.timeit(lambda: shlexTokenize(expression), number=arguments.number) / arguments.number * 1e6
+        new = timeit.timeit(lambda: Parser.tokenize(expression), number=arguments.number) / arguments.number * 1e6
+        print('%-60s %12.2f %12.2f %7.1fx' % (expression[:60], old, new, old / new))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -32,5 +32,12 @@ do
     OUTPUT=tests/$TEST.result
 
     # diff $OUTPUT <(cat $INPUT | ./JTL/__init__.py -t tests/$TEST.jtl)
-    python3 ./JTL/__init__.py -t tests/$TEST.jtl -s tests/$TEST.json -r tests/$TEST.result
+    python3 -m JTL -t tests/$TEST.jtl -s tests/$TEST.json -r tests/$TEST.result
 done
+
+echo "********** faa1 ndjson **********"
+python3 -m JTL -n -t tests/faa1.jtl -s tests/faa1.ndjson -r tests/faa1.ndjson.result
+python3 -m JTL -n -j 2 --batch-size 1 -t tests/faa1.jtl -s tests/faa1.ndjson -r tests/faa1.ndjson.result
+
+echo "********** faa1 array **********"
+python3 -m JTL -a -t tests/faa1.jtl -s tests/faa1.array.json -r tests/faa1.array.result